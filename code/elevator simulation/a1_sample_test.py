@@ -18,11 +18,27 @@ Note: this file is for support purposes only, and is not part of your
 submission.
 """
 
+from algorithms import ArrivalGenerator, Direction, MovingAlgorithm
 from algorithms import PushyPassenger, RandomAlgorithm, ShortSighted, RandomArrivals, FileArrivals
+from algorithms import Look
+from algorithms import StreamingFileArrivals, sort_arrivals_file
+from algorithms import BinaryFileArrivals, convert_csv_to_trace
+from entities import Clock, FloorQueue, Person, Elevator, WaitingFloors
 from simulation import Simulation
+from events import EventSimulation
+from vectorized import BulkRandomArrivals, VectorizedSimulation
+from montecarlo import format_replicas, run_replicas, summarize
+from dispatch import GroupDispatcher
+from metrics import TripTimeAccumulator
 from hypothesis import given
 from typing import List
 import hypothesis.strategies as st
+import csv
+import numpy as np
+import pytest
+import random
+import subprocess
+import sys
 
 
 def test_random_arrival_generator_zero() -> None:
@@ -114,6 +130,86 @@ def test_file_arrival_generator_2() -> None:
             assert people[4].target == 6
 
 
+def test_file_arrival_generator_merges_duplicate_rounds(tmp_path) -> None:
+    """Test that rows for the same round are merged in file order."""
+    csv_path = tmp_path / 'arrivals.csv'
+    csv_path.write_text('2, 3, 1\n0, 1, 2\n2, 1, 4, 3, 2\n')
+    file_generator = FileArrivals(4, str(csv_path))
+
+    round_two = file_generator.generate(2)
+    assert set(round_two) == {1, 3}
+    assert [p.target for p in round_two[3]] == [1, 2]
+    assert [p.target for p in round_two[1]] == [4]
+    assert file_generator.generate(1) == {}
+
+
+def test_streaming_file_arrivals_sorted_file(tmp_path) -> None:
+    """Test streaming an unsorted file after sorting it externally, in
+    chunks of two rows merged two files at a time.
+    """
+    unsorted_path = tmp_path / 'unsorted.csv'
+    sorted_path = tmp_path / 'sorted.csv'
+    unsorted_path.write_text('5, 4, 2\n1, 1, 4, 5, 3\n3, 1, 2\n'
+                             '1, 2, 3\n0, 3, 5\n')
+    sort_arrivals_file(str(unsorted_path), str(sorted_path),
+                       chunk_rows=2, fan_in=2)
+    assert sorted_path.read_text().split() == [
+        '0,3,5', '1,1,4,5,3', '1,2,3', '3,1,2', '5,4,2']
+
+    file_generator = FileArrivals(5, str(unsorted_path))
+    with StreamingFileArrivals(5, str(sorted_path)) as stream:
+        for round_num in range(8):
+            streamed = stream.generate(round_num)
+            expected = file_generator.generate(round_num)
+            assert ({floor: [(p.start, p.target) for p in people]
+                     for floor, people in streamed.items()} ==
+                    {floor: [(p.start, p.target) for p in people]
+                     for floor, people in expected.items()})
+
+        with pytest.raises(ValueError):
+            stream.generate(3)
+
+    # a run that stops before the end of the file closes it on leaving
+    with StreamingFileArrivals(5, str(sorted_path)) as stream:
+        assert list(stream.generate(0)) == [3]
+    assert stream.generate(1) == {}
+
+
+def test_streaming_file_arrivals_unsorted_file(tmp_path) -> None:
+    """Test that streaming an unsorted file fails clearly."""
+    csv_path = tmp_path / 'unsorted.csv'
+    csv_path.write_text('1, 1, 2\n4, 2, 1\n2, 1, 3\n')
+    with StreamingFileArrivals(3, str(csv_path)) as stream:
+        assert len(stream.generate(1)[1]) == 1
+        # The row for round 2 is only reached after the rows for round 4.
+        with pytest.raises(ValueError, match='line 3'):
+            stream.generate(4)
+
+
+def test_binary_file_arrivals(tmp_path) -> None:
+    """Test that a converted binary trace generates the same arrivals as
+    the CSV file it was converted from.
+    """
+    trace_path = str(tmp_path / 'sample_arrivals.trace')
+    convert_csv_to_trace('sample_arrivals.csv', trace_path)
+    trace_generator = BinaryFileArrivals(5, trace_path)
+    file_generator = FileArrivals(5, 'sample_arrivals.csv')
+
+    assert trace_generator.num_rounds == 6
+    assert trace_generator.round_pairs(1).tolist() == [1, 4, 5, 3]
+    for round_num in [7, 5, 0, 1, 3]:
+        traced = trace_generator.generate(round_num)
+        expected = file_generator.generate(round_num)
+        assert ({floor: [(p.start, p.target) for p in people]
+                 for floor, people in traced.items()} ==
+                {floor: [(p.start, p.target) for p in people]
+                 for floor, people in expected.items() if people})
+    trace_generator.close()
+
+    with pytest.raises(ValueError):
+        BinaryFileArrivals(5, 'sample_arrivals.csv')
+
+
 def test_random_moving_algorithm() -> None:
     """Test the random moving algorithm.
 
@@ -228,6 +324,638 @@ def test_short_sighted_moving_algorithm() -> None:
     assert results['avg_time'] == 4
 
 
+def test_short_sighted_uses_waiting_floor_index() -> None:
+    """Test that WaitingFloors keeps the floors with people waiting in order,
+    and that Short-Sighted picks the same floors from it as from a plain
+    dictionary."""
+    waiting = WaitingFloors(9)
+    for start in [7, 3, 7, 9]:
+        waiting.add(start, Person(start, 1 if start != 1 else 2))
+    assert waiting.occupied == [3, 7, 9]
+    assert len(waiting.board(7, 1)) == 1 and waiting.occupied == [3, 7, 9]
+    assert len(waiting.board(7, 5)) == 1 and waiting.occupied == [3, 9]
+    assert waiting.board(7, 5) == []
+
+    plain = {floor: list(people) for floor, people in waiting.items()}
+    for floor in range(1, 10):
+        elevator = Elevator(2, 9)
+        elevator.current_floor = floor
+        assert ShortSighted().move_elevators([elevator], waiting, 9) == \
+            ShortSighted().move_elevators([elevator], plain, 9)
+
+
+def test_pushy_passenger_decides_each_elevator_alone() -> None:
+    """Test that Pushy Passenger sends each empty elevator to the lowest floor
+    with people waiting, whichever elevators it is asked about together."""
+    waiting = WaitingFloors(6)
+    plain = {floor: [] for floor in range(1, 7)}
+    assert PushyPassenger().move_elevators([Elevator(1, 6)], waiting, 6) == \
+        [Direction.STAY]
+    for start in [5, 3]:
+        waiting.add(start, Person(start, 6))
+        plain[start].append(Person(start, 6))
+
+    elevators = []
+    for floor in [1, 3, 6]:
+        elevator = Elevator(1, 6)
+        elevator.current_floor = floor
+        elevators.append(elevator)
+    rider = Elevator(1, 6)
+    rider.load(Person(2, 1))
+    rider.current_floor = 2
+    elevators.append(rider)
+
+    expected = [Direction.UP, Direction.STAY, Direction.DOWN, Direction.DOWN]
+    for waiting_floors in [waiting, plain]:
+        assert PushyPassenger().move_elevators(elevators, waiting_floors,
+                                               6) == expected
+        assert [PushyPassenger().move_elevators([elevator], waiting_floors,
+                                                6)[0]
+                for elevator in elevators] == expected
+
+
+def test_look_algorithm_sweeps() -> None:
+    """Test that Look keeps an elevator heading the same way while it has
+    stops ahead, then turns around, and that it delivers everyone."""
+    waiting = WaitingFloors(6)
+    waiting.add(1, Person(1, 6))
+    elevator = Elevator(2, 6)
+    elevator.current_floor = 3
+    elevator.load(Person(2, 5))
+    look = Look()
+
+    # the passenger's floor is ahead, so the waiting person below must wait
+    assert look.move_elevators([elevator], waiting, 6) == [Direction.UP]
+    elevator.current_floor = 5
+    elevator.unload(5)
+    assert look.move_elevators([elevator], waiting, 6) == [Direction.DOWN]
+    elevator.current_floor = 4
+    assert look.move_elevators([elevator], waiting, 6) == [Direction.DOWN]
+    waiting.board(1, 1)
+    assert look.move_elevators([elevator], waiting, 6) == [Direction.STAY]
+
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 1,
+        'num_people_per_round': None,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': Look(),
+        'visualize': False
+    }
+    results = Simulation(config).run(30)
+    assert results['people_completed'] == results['total_people'] == 4
+
+
+def test_group_dispatcher_spreads_elevators() -> None:
+    """Test that the group dispatcher sends empty elevators to different
+    floors, and that its batched assignment is the greedy one."""
+    waiting = WaitingFloors(9)
+    waiting.add(3, Person(3, 1))
+    waiting.add(8, Person(8, 1))
+    plain = {floor: list(people) for floor, people in waiting.items()}
+    elevators = []
+    for floor in [4, 5]:
+        elevator = Elevator(2, 9)
+        elevator.current_floor = floor
+        elevators.append(elevator)
+
+    # short-sighted sends both elevators to floor 3
+    assert ShortSighted().move_elevators(elevators, waiting, 9) == \
+        [Direction.DOWN, Direction.DOWN]
+    for waiting_floors in [waiting, plain]:
+        assert GroupDispatcher().move_elevators(elevators, waiting_floors,
+                                                9) == \
+            [Direction.DOWN, Direction.UP]
+
+    dispatcher = GroupDispatcher()
+    rng = random.Random(148)
+    values = list(range(8 * 20))
+    rng.shuffle(values)
+    # 8 elevators and floors 1 to 20, all with different costs
+    dispatcher._costs = np.zeros((8, 21), dtype=np.int32)
+    dispatcher._costs[:, 1:] = np.array(values).reshape(8, 20)
+    floors = sorted(rng.sample(range(1, 21), 12))
+    expected = {}
+    pairs = sorted((dispatcher._costs[i, floor], i, floor)
+                   for i in range(8) for floor in floors)
+    for _, i, floor in pairs:
+        if i not in expected and floor not in expected.values():
+            expected[i] = floor
+    assert dispatcher._assign(floors) == expected
+
+
+def test_headless_entities_have_no_sprites() -> None:
+    """Test that a headless simulation never attaches sprites to its entities.
+    """
+    person = Person(1, 3)
+    assert person.sprite is None
+    assert person.get_anger_level() == 0
+    assert Elevator(2, 5).sprite is None
+
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': 2,
+        'arrival_generator': RandomArrivals(5, 2),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False
+    }
+    sim = Simulation(config)
+    sim.run(5)
+    assert all(elevator.sprite is None for elevator in sim.elevators)
+    for people in sim.waiting.values():
+        assert all(person.sprite is None for person in people)
+
+
+def test_headless_simulation_does_not_import_pygame() -> None:
+    """Test that building and running a headless simulation leaves pygame
+    unimported.
+    """
+    code = (
+        "import sys\n"
+        "import algorithms\n"
+        "from simulation import Simulation\n"
+        "Simulation({'num_floors': 5, 'num_elevators': 1,\n"
+        "            'elevator_capacity': 1, 'num_people_per_round': 1,\n"
+        "            'arrival_generator': algorithms.RandomArrivals(5, 1),\n"
+        "            'moving_algorithm': algorithms.ShortSighted(),\n"
+        "            'visualize': False}).run(3)\n"
+        "assert 'pygame' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_wait_time_follows_clock() -> None:
+    """Test that a person's wait time is derived from their arrival round."""
+    clock = Clock()
+    clock.round_num = 4
+    person = Person(1, 3)
+    person.start_waiting(clock)
+    assert person.wait_time == 0
+
+    clock.round_num = 9
+    assert person.wait_time == 5
+    assert person.get_anger_level() == 2
+
+    person.increase_wait_time()
+    assert person.wait_time == 6
+    person.wait_time = 9
+    assert person.get_anger_level() == 4
+
+
+def test_wait_time_stops_at_target_floor() -> None:
+    """Test that a person's wait time stops growing once they reach their
+    target floor, both directly and in a simulation."""
+    clock = Clock()
+    person = Person(1, 3)
+    person.start_waiting(clock)
+    clock.round_num = 3
+    person.finish_waiting()
+    clock.round_num = 9
+    assert person.wait_time == 3
+    assert person.get_anger_level() == 1
+
+    class Recording(FileArrivals):
+        def generate(self, round_num: int) -> dict:
+            arrivals = FileArrivals.generate(self, round_num)
+            for people in arrivals.values():
+                everyone.extend(people)
+            return arrivals
+
+    for engine in [Simulation, EventSimulation]:
+        everyone = []
+        config = {
+            'num_floors': 5,
+            'num_elevators': 2,
+            'elevator_capacity': 2,
+            'num_people_per_round': None,
+            'arrival_generator': Recording(5, 'sample_arrivals.csv'),
+            'moving_algorithm': ShortSighted(),
+            'visualize': False
+        }
+        results = engine(config).run(40)
+        assert results['people_completed'] == len(everyone) == 4
+        # the clock ran on long after the last person arrived
+        assert max(person.wait_time for person in everyone) == \
+            results['max_time'] < 20
+
+
+def test_floor_queue_pops_in_arrival_order() -> None:
+    """Test that boarding takes the longest-waiting people first."""
+    people = [Person(1, target) for target in range(2, 7)]
+    queue = FloorQueue(people)
+
+    assert queue.pop_front(2) == people[:2]
+    assert queue[0] is people[2]
+    assert queue.pop_front(10) == people[2:]
+    assert queue.pop_front(1) == []
+
+
+def test_elevator_unloads_by_target_floor() -> None:
+    """Test that an elevator unloads one target floor at a time, keeping the
+    boarding order of everyone else.
+    """
+    elevator = Elevator(5, 8)
+    elevator.current_floor = 4
+    people = [Person(4, 6), Person(4, 2), Person(4, 6), Person(4, 8)]
+    for person in people:
+        elevator.load(person)
+
+    # 2 and 6 are equally close to 4: the lower floor wins.
+    assert elevator.closest_target() == 2
+    passengers = elevator.passengers
+    assert elevator.unload(5) == []
+    assert elevator.unload(6) == [people[0], people[2]]
+    assert elevator.passengers == [people[1], people[3]]
+    assert elevator.passengers is passengers
+    assert elevator.closest_target() == 2
+    assert elevator.unload(2) == [people[1]]
+    assert elevator.closest_target() == 8
+
+
+def test_person_sprites_share_images() -> None:
+    """Test that person sprites share one image per anger level."""
+    import sprites
+    calm, angry = Person(1, 2), Person(3, 4)
+    angry.wait_time = 9
+    calm_sprite = sprites.PersonSprite(calm)
+    angry_sprite = sprites.PersonSprite(angry)
+    assert calm_sprite.image is sprites.PersonSprite(Person(2, 1)).image
+    assert calm_sprite.image is not angry_sprite.image
+
+    calm.wait_time = 9
+    assert calm_sprite.load_image() is angry_sprite.image
+
+
+def test_visualizer_redraws_only_what_changed(monkeypatch) -> None:
+    """Test that the dirty-rectangle rendering leaves the screen exactly as
+    redrawing everything would, that a frame where nothing changed updates
+    nothing, and that at speed 0 each round's animations play together
+    without any pauses."""
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    import visualizer
+
+    def no_sleeping(seconds: float) -> None:
+        raise AssertionError('speed 0 should never sleep')
+    monkeypatch.setattr(visualizer.time, 'sleep', no_sleeping)
+    frames = []
+    draw_frame = visualizer.Visualizer._draw_frame
+    monkeypatch.setattr(visualizer.Visualizer, '_draw_frame',
+                        lambda view: frames.append(draw_frame(view)))
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': None,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': ShortSighted(),
+        'visualize': True,
+        'speed': 0
+    }
+    sim = Simulation(config)
+    sim.run(8)
+    # the header, the arrivals, the animations and the final frame
+    assert len(frames) <= 1 + 8 * (visualizer.ANIMATION_FRAMES + 3)
+
+    view = sim.visualizer
+    everything = view._background.copy()
+    for sprite in view._sprite_group.sprites():
+        everything.blit(sprite.image, sprite.rect)
+    assert pygame.image.tostring(everything, 'RGB') == \
+        pygame.image.tostring(view._screen, 'RGB')
+    assert view._sprite_group.draw(view._screen) == []
+    pygame.quit()
+
+
+def test_vectorized_simulation_matches_simulation() -> None:
+    """Test that the vectorized engine gives the same statistics as
+    Simulation for the deterministic moving algorithms."""
+    for algorithm in [PushyPassenger, ShortSighted]:
+        stats = []
+        for engine in [Simulation, VectorizedSimulation]:
+            config = {
+                'num_floors': 6,
+                'num_elevators': 2,
+                'elevator_capacity': 2,
+                'num_people_per_round': None,
+                'arrival_generator': FileArrivals(6, 'sample_arrivals.csv'),
+                'moving_algorithm': algorithm(),
+                'visualize': False
+            }
+            stats.append(engine(config).run(15))
+        assert stats[0] == stats[1]
+
+
+def test_vectorized_simulation_grows_only_long_queues(tmp_path) -> None:
+    """Test that a long queue on one floor gives the same statistics as
+    Simulation, and makes room on that floor only."""
+    csv_path = tmp_path / 'lobby.csv'
+    rows = []
+    for round_num in range(10):
+        pairs = [f'1, {target}' for target in range(2, 12)]
+        rows.append(f"{round_num}, {', '.join(pairs)}, 5, 3\n")
+    csv_path.write_text(''.join(rows))
+
+    engines = []
+    for engine in [Simulation, VectorizedSimulation]:
+        engines.append(engine({
+            'num_floors': 20,
+            'num_elevators': 1,
+            'elevator_capacity': 2,
+            'num_people_per_round': None,
+            'arrival_generator': FileArrivals(20, str(csv_path)),
+            'moving_algorithm': ShortSighted(),
+            'visualize': False
+        }))
+    assert engines[0].run(30) == engines[1].run(30)
+    capacity = engines[1]._wait_capacity
+    assert capacity[1] >= 100 and max(capacity[2:]) == capacity[2]
+
+
+def test_vectorized_simulation_matches_in_large_building() -> None:
+    """Test that the vectorized engine gives the same statistics as
+    Simulation in a busy building, with many elevators sharing floors."""
+    for algorithm in [PushyPassenger, ShortSighted]:
+        stats = []
+        for engine in [Simulation, VectorizedSimulation]:
+            config = {
+                'num_floors': 200,
+                'num_elevators': 32,
+                'elevator_capacity': 4,
+                'num_people_per_round': 20,
+                'arrival_generator': BulkRandomArrivals(200, 20, 100),
+                'moving_algorithm': algorithm(),
+                'visualize': False,
+                'seed': 148
+            }
+            stats.append(engine(config).run(300))
+        assert stats[0] == stats[1]
+
+
+def test_event_simulation_matches_simulation(tmp_path) -> None:
+    """Test that the event-driven simulation gives the same results as
+    Simulation, and runs only the rounds with events on a sparse trace."""
+    sparse = tmp_path / 'sparse.csv'
+    sparse.write_text('3,1,9\n400,8,2\n400,5,6\n2000,10,1\n')
+    traces = [('sample_arrivals.csv', 5),
+              ('sample_arrival_5floors_10rounds.csv', 5),
+              ('sample_arrival_10floors_3rounds.csv', 10),
+              (str(sparse), 10)]
+    for filename, num_floors in traces:
+        for algorithm in [PushyPassenger, ShortSighted, RandomAlgorithm]:
+            results = []
+            for engine in [Simulation, EventSimulation]:
+                config = {
+                    'num_floors': num_floors,
+                    'num_elevators': 3,
+                    'elevator_capacity': 2,
+                    'num_people_per_round': None,
+                    'arrival_generator': FileArrivals(num_floors, filename),
+                    'moving_algorithm': algorithm(),
+                    'visualize': False,
+                    'seed': 4
+                }
+                results.append(engine(config).run(2500))
+            assert results[0] == results[1]
+
+    config['arrival_generator'] = FileArrivals(10, str(sparse))
+    config['moving_algorithm'] = ShortSighted()
+    simulation = EventSimulation(config)
+    simulation.run(2500)
+    assert simulation.rounds_run < 100
+
+
+def test_monte_carlo_replicas_are_reproducible() -> None:
+    """Test that replicas run in a pool get the same results as in-process
+    replicas with the same seed, and that they are summarized."""
+    config = {
+        'num_floors': 6,
+        'num_elevators': 2,
+        'elevator_capacity': 3,
+        'num_people_per_round': 2,
+        'arrival_generator': RandomArrivals(6, 2),
+        'moving_algorithm': RandomAlgorithm(),
+        'visualize': False
+    }
+    pooled = run_replicas(config, 10, 6, seed=1, max_workers=2)
+    assert pooled == run_replicas(config, 10, 6, seed=1, max_workers=1)
+    assert len(set(str(result) for result in pooled)) > 1
+
+    summary = summarize(pooled)
+    assert summary['total_people'] == {'n': 6, 'mean': 20.0, 'stdev': 0.0,
+                                       'ci_low': 20.0, 'ci_high': 20.0}
+    completed = summary['people_completed']
+    assert completed['ci_low'] <= completed['mean'] <= completed['ci_high']
+
+    timed = run_replicas(dict(config, stage_timings=True), 10, 2, seed=1,
+                         max_workers=1)
+    header = format_replicas(timed).splitlines()[0]
+    assert 'people_completed' in header and 'stage_timings' not in header
+
+
+def test_seeded_simulations_are_reproducible() -> None:
+    """Test that a seeded simulation gets the same results however the
+    random module's shared generator is used."""
+    def run(engine: type, seed: int, global_seed: int) -> dict:
+        random.seed(global_seed)
+        config = {
+            'num_floors': 8,
+            'num_elevators': 3,
+            'elevator_capacity': 2,
+            'num_people_per_round': 2,
+            'arrival_generator': RandomArrivals(8, 2),
+            'moving_algorithm': RandomAlgorithm(),
+            'visualize': False,
+            'seed': seed
+        }
+        return engine(config).run(30)
+
+    for engine in [Simulation, VectorizedSimulation]:
+        assert run(engine, 5, 1) == run(engine, 5, 2)
+    results = [run(Simulation, seed, 1) for seed in range(5)]
+    assert len(set(str(result) for result in results)) > 1
+
+
+def test_bulk_random_arrivals() -> None:
+    """Test that BulkRandomArrivals draws valid people reproducibly, past its
+    block of rounds too."""
+    generator = BulkRandomArrivals(4, 3, 5)
+    generator.reseed(11)
+    rounds = [generator.generate(round_num) for round_num in range(12)]
+    for arrivals in rounds:
+        people = [person for floor in arrivals
+                  for person in arrivals[floor]]
+        assert len(people) == 3
+        for floor, floor_people in arrivals.items():
+            for person in floor_people:
+                assert person.start == floor
+                assert person.start != person.target
+                assert 1 <= person.target <= 4
+
+    generator.reseed(11)
+    starts, targets = generator.generate_arrays(0)
+    assert sorted(zip(starts.tolist(), targets.tolist())) == \
+        sorted((p.start, p.target) for floor_people in rounds[0].values()
+               for p in floor_people)
+
+
+@given(st.lists(st.integers(min_value=0, max_value=20000), max_size=200))
+def test_trip_time_accumulator(trip_times: List[int]) -> None:
+    """Test that the trip time accumulator matches statistics computed from
+    the full list of trip times."""
+    accumulator = TripTimeAccumulator()
+    for trip_time in trip_times:
+        accumulator.add(trip_time)
+    if not trip_times:
+        assert accumulator.minimum == accumulator.mean() == -1
+        assert accumulator.percentile(50) == -1
+        return
+
+    assert accumulator.count == len(trip_times)
+    assert accumulator.minimum == min(trip_times)
+    assert accumulator.maximum == max(trip_times)
+    assert accumulator.mean() == int(sum(trip_times) / len(trip_times))
+    ordered = sorted(trip_times)
+    for percent in [1, 50, 95, 99, 100]:
+        expected = ordered[max(1, -(-percent * len(ordered) // 100)) - 1]
+        assert abs(accumulator.percentile(percent) - expected) \
+            <= expected // 50
+
+
+def test_round_metrics(tmp_path) -> None:
+    """Test that a run records one metrics row per round, with the same
+    completions as the final statistics."""
+    filename = str(tmp_path / 'rounds.csv')
+    config = {
+        'num_floors': 6,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': None,
+        'arrival_generator': FileArrivals(6, 'sample_arrivals.csv'),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False,
+        'round_metrics': filename
+    }
+    stats = Simulation(config).run(15)
+    with open(filename) as csvfile:
+        rows = list(csv.DictReader(csvfile))
+    assert [int(row['round']) for row in rows] == list(range(15))
+    assert sum(int(row['completed']) for row in rows) == \
+        stats['people_completed']
+    assert all(int(row['in_transit']) ==
+               int(row['elevator_load_1']) + int(row['elevator_load_2'])
+               for row in rows)
+
+
+def test_stage_timings_and_profiler() -> None:
+    """Test that stage timings are reported when asked for, and that the
+    profiler hook is enabled only while the simulation runs."""
+    class RecordingProfiler:
+        def __init__(self) -> None:
+            self.calls = []
+
+        def enable(self) -> None:
+            self.calls.append('enable')
+
+        def disable(self) -> None:
+            self.calls.append('disable')
+
+    profiler = RecordingProfiler()
+    config = {
+        'num_floors': 6,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': None,
+        'arrival_generator': FileArrivals(6, 'sample_arrivals.csv'),
+        'moving_algorithm': RandomAlgorithm(),
+        'visualize': False,
+        'seed': 1,
+        'stage_timings': True,
+        'profiler': profiler
+    }
+    stats = Simulation(config).run(15)
+    assert profiler.calls == ['enable', 'disable']
+    timings = stats.pop('stage_timings')
+    assert set(timings) == {'generate_arrivals', 'handle_leaving',
+                            'handle_boarding', 'move_elevators', 'visualizer'}
+    assert timings['handle_boarding']['calls'] == 15
+    assert timings['visualizer']['calls'] == 45
+    assert all(timing['total_ns'] >= 0 for timing in timings.values())
+
+    config['stage_timings'] = False
+    config['profiler'] = None
+    config['arrival_generator'] = FileArrivals(6, 'sample_arrivals.csv')
+    assert Simulation(config).run(15) == stats
+
+
+def test_benchmark_regressions() -> None:
+    """Test that the benchmark suite flags only the cases that got slower or
+    bigger by more than the threshold."""
+    import benchmark
+    results = benchmark.run_suite(['pushy'], [5], [1, 2], [1], 5, 1)
+    assert set(results['cases']) == {
+        benchmark.case_name('pushy', 5, 1, 1),
+        benchmark.case_name('pushy', 5, 2, 1)}
+    assert benchmark.find_regressions(results, results, 0.1) == []
+
+    baseline = {'cases': {'a': {'seconds': 1.0, 'peak_kib': 100.0},
+                          'b': {'seconds': 1.0, 'peak_kib': 100.0}}}
+    current = {'cases': {'a': {'seconds': 1.05, 'peak_kib': 100.0},
+                         'b': {'seconds': 1.0, 'peak_kib': 150.0},
+                         'c': {'seconds': 9.0, 'peak_kib': 900.0}}}
+    regressions = benchmark.find_regressions(current, baseline, 0.1)
+    assert len(regressions) == 1 and regressions[0].startswith('b: peak_kib')
+
+    current['cases']['a']['seconds'] = 2.0
+    assert len(benchmark.find_regressions(current, baseline, 0.1)) == 2
+    assert benchmark.find_regressions(current, baseline, 0.1,
+                                      ('peak_kib',)) == regressions
+
+
+def test_idle_rounds_are_skipped(tmp_path) -> None:
+    """Test that a sparse trace gives the same results with idle rounds
+    skipped, and that the skipped rounds are not run."""
+    filename = tmp_path / 'sparse.csv'
+    filename.write_text('2,1,4\n5000,3,1\n5000,2,5\n15000,4,2\n')
+
+    def run(algorithm: MovingAlgorithm, generator: ArrivalGenerator) -> dict:
+        config = {
+            'num_floors': 5,
+            'num_elevators': 2,
+            'elevator_capacity': 2,
+            'num_people_per_round': None,
+            'arrival_generator': generator,
+            'moving_algorithm': algorithm,
+            'visualize': False,
+            'stage_timings': True
+        }
+        return Simulation(config).run(20000)
+
+    class NeverIdle(ArrivalGenerator):
+        def __init__(self, arrivals: FileArrivals) -> None:
+            ArrivalGenerator.__init__(self, 5, None)
+            self.arrivals = arrivals
+
+        def generate(self, round_num: int) -> dict:
+            return self.arrivals.generate(round_num)
+
+    for algorithm in [PushyPassenger, ShortSighted]:
+        skipped = run(algorithm(), FileArrivals(5, str(filename)))
+        slow = run(algorithm(), NeverIdle(FileArrivals(5, str(filename))))
+        assert skipped['stage_timings']['move_elevators']['calls'] < 100
+        assert slow['stage_timings']['move_elevators']['calls'] == 20000
+        del skipped['stage_timings'], slow['stage_timings']
+        assert skipped == slow
+
+        with StreamingFileArrivals(5, str(filename)) as stream:
+            streamed = run(algorithm(), stream)
+        del streamed['stage_timings']
+        assert streamed == skipped
+
+
 if __name__ == '__main__':
     import pytest
     pytest.main(['a1_sample_test.py'])
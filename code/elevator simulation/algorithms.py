@@ -18,10 +18,44 @@ sections of the assignment handout for a complete description of each algorithm
 you are expected to implement in this file.
 """
 import csv
+import heapq
+from bisect import bisect_left, bisect_right
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+import random
 from enum import Enum
-from random import sample, choice
-from typing import Dict, List, Optional
-from entities import Person, Elevator
+from typing import (Any, BinaryIO, Dict, Iterable, Iterator, List, Optional,
+                    TextIO, Tuple)
+from entities import Person, Elevator, WaitingFloors
+
+
+def derive_seed(seed: int, name: str) -> int:
+    """Return the seed of the random stream called <name> split from the
+    master seed <seed>.
+
+    Different names give independent streams, and the same seed and name
+    always give the same stream, in any process.
+    """
+    return random.Random(f'{seed}:{name}').getrandbits(64)
+
+
+def seed_streams(config: Dict[str, Any]) -> None:
+    """Give the arrival generator and moving algorithm of the simulation
+    configuration <config> their own random streams, split from the master
+    seed config['seed'].
+
+    Do nothing if <config> has no seed (or it is None), so that both keep
+    using the random module's shared generator.
+    """
+    seed = config.get('seed')
+    if seed is not None:
+        config['arrival_generator'].reseed(derive_seed(seed, 'arrivals'))
+        config['moving_algorithm'].reseed(derive_seed(seed, 'moving'))
 
 
 ###############################################################################
@@ -37,6 +71,10 @@ class ArrivalGenerator:
     num_people: The number of people to generate, or None if this is left
                 up to the algorithm itself.
 
+    === Private Attributes ===
+    _rng: This generator's own random stream, or None to use the random
+          module's shared generator (until reseed is called).
+
     === Representation Invariants ===
     max_floor >= 2
     num_people is None or num_people >= 0
@@ -53,6 +91,11 @@ class ArrivalGenerator:
         """
         self.max_floor = max_floor
         self.num_people = num_people
+        self._rng = None
+
+    def reseed(self, seed: int) -> None:
+        """Give this generator its own random stream, seeded with <seed>."""
+        self._rng = random.Random(seed)
 
     def generate(self, round_num: int) -> Dict[int, List[Person]]:
         """Return the new arrivals for the simulation at the given round.
@@ -64,6 +107,19 @@ class ArrivalGenerator:
         """
         raise NotImplementedError
 
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round, from <round_num> on, in which someone may
+        arrive, or None if nobody will ever arrive again.
+
+        The simulations use this to skip over rounds where nothing happens.
+        A generator that cannot tell returns <round_num>, which is always
+        safe.
+
+        Precondition: round_num is greater than the round of every previous
+        call to generate.
+        """
+        return round_num
+
 
 class RandomArrivals(ArrivalGenerator):
     """Generate a fixed number of random people each round.
@@ -90,12 +146,19 @@ class RandomArrivals(ArrivalGenerator):
         if self.num_people:
 
             for n in range(self.num_people):
-                start, target = sample(range(1, self.max_floor + 1), 2)
+                start, target = (self._rng or random).sample(
+                    range(1, self.max_floor + 1), 2)
                 assert start != target
                 arrivals[start].append(Person(start, target))
 
         return arrivals
 
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round, from <round_num> on, in which someone may
+        arrive, or None if nobody will ever arrive again.
+        """
+        return round_num if self.num_people else None
+
 
 class FileArrivals(ArrivalGenerator):
     """Generate arrivals from a CSV file.
@@ -105,7 +168,11 @@ class FileArrivals(ArrivalGenerator):
                beyond this floor.
     num_people: The number of people to generate, or None if this is left
                 up to the algorithm itself.
-    _arrivals_from_file: All arrives at all rounds
+    _arrivals_by_round: The (start, target) floors of the arrivals at each
+                        round that has any, in file order. Rows of the file
+                        with the same round number are merged in file order.
+    _arrival_rounds: The rounds in which someone arrives, in increasing
+                     order.
 
     === Presentation Invariants ===
     max_floor >= 2
@@ -114,7 +181,8 @@ class FileArrivals(ArrivalGenerator):
     """
     max_floor: int
     filename: str
-    _arrival_from_file: List
+    _arrivals_by_round: Dict[int, List[Tuple[int, int]]]
+    _arrival_rounds: List[int]
 
     def __init__(self, max_floor: int, filename: str) -> None:
         """Initialize a new FileArrivals algorithm from the given file.
@@ -128,7 +196,7 @@ class FileArrivals(ArrivalGenerator):
         """
 
         ArrivalGenerator.__init__(self, max_floor, None)
-        self._arrivals_from_file = []
+        self._arrivals_by_round = {}
 
         # We've provided some of the "reading from csv files" boilerplate code
         # for you to help you get started.
@@ -136,32 +204,442 @@ class FileArrivals(ArrivalGenerator):
         with open(filename) as csvfile:
             reader = csv.reader(csvfile)
             for line in reader:
-                self._arrivals_from_file.append([int(i) for i in line])
+                round_num, *floors = [int(i) for i in line]
+                # group the arrivals by round once, so generate is a lookup
+                pairs = self._arrivals_by_round.setdefault(round_num, [])
+                for index in range(0, len(floors) - 1, 2):
+                    pairs.append((floors[index], floors[index + 1]))
 
-        # sort the arrival list according to round order
-        self._arrivals_from_file.sort()
+        self._arrival_rounds = sorted(
+            round_num for round_num, pairs in self._arrivals_by_round.items()
+            if pairs)
 
     def generate(self, round_num: int) -> Dict[int, List[Person]]:
         """ Return the a round of new arrivals.
-        """
-        arrivals = dict().fromkeys(i for i in range(1, self.max_floor + 1))
 
-        # to initialize the new arrivals dictionary, each floor has a list of
-        # new arrivals
-        for key in arrivals.keys():
-            arrivals[key] = []
+        Only floors where people arrived are included (as ArrivalGenerator
+        allows), so a round with no arrivals gives an empty dictionary. This
+        differs from the original version, which listed every floor.
+        """
+        arrivals = {}
 
         # to add the new arrivals of round_num into the new arrivals dictionary
-        for round in self._arrivals_from_file:
-            if round[0] == round_num:
-                index = 1
-                while index+1 < len(round):
-                    start, target = round[index], round[index + 1]
+        for start, target in self._arrivals_by_round.get(round_num, []):
+            if start in arrivals:
+                arrivals[start].append(Person(start, target))
+            else:
+                arrivals[start] = [Person(start, target)]
+
+        return arrivals
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round, from <round_num> on, in which someone
+        arrives, or None if nobody arrives after <round_num>.
+        """
+        index = bisect_left(self._arrival_rounds, round_num)
+        if index == len(self._arrival_rounds):
+            return None
+        return self._arrival_rounds[index]
+
+
+class StreamingFileArrivals(ArrivalGenerator):
+    """Generate arrivals from a CSV file sorted by round number, reading it
+    lazily.
+
+    The file has the same format as for FileArrivals, except that its rows
+    must be in non-decreasing round order (use sort_arrivals_file to sort a
+    file first); generate raises ValueError when it reaches a row that is out
+    of order. Only the rows for the round being generated are kept in
+    memory, so traces of any length run in a small, fixed amount of memory.
+    Rows with the same round number are merged in file order.
+
+    generate must be called with strictly increasing round numbers, as a
+    Simulation does.
+
+    The file stays open until it has been read to the end or close is
+    called, so use the generator in a with statement when a run may stop
+    before the end of the file:
+
+        with StreamingFileArrivals(max_floor, filename) as arrivals:
+            ...
+
+    === Attributes ===
+    max_floor: The maximum floor number for the building.
+    num_people: Always None; the number of arrivals depends on the file.
+    filename: The CSV file the arrivals are read from.
+    _csvfile: The open CSV file, or None once it has been read to the end or
+              closed.
+    _reader: The CSV reader over _csvfile.
+    _next_row: The first row read from the file but not generated yet, or
+               None if there are no rows left.
+    _last_round: The last round number passed to generate, or -1.
+
+    === Representation Invariants ===
+    max_floor >= 2
+    num_people is None
+    """
+    max_floor: int
+    num_people: Optional[int]
+    filename: str
+    _csvfile: Optional[TextIO]
+    _reader: Iterator[List[str]]
+    _next_row: Optional[List[int]]
+    _last_round: int
+
+    def __init__(self, max_floor: int, filename: str) -> None:
+        """Initialize a new StreamingFileArrivals reading the given file.
+
+        Precondition:
+            <filename> refers to a valid CSV file, following the specified
+            format and restrictions from the assignment handout.
+        """
+        ArrivalGenerator.__init__(self, max_floor, None)
+        self.filename = filename
+        self._csvfile = open(filename, newline='')
+        self._reader = csv.reader(self._csvfile)
+        self._next_row = None
+        self._next_row = self._read_row()
+        self._last_round = -1
+
+    def _read_row(self) -> Optional[List[int]]:
+        """ Return the next non-empty row of the file, or None at the end of
+        the file.
+
+        Raise ValueError if the row's round number is lower than that of the
+        row before it.
+        """
+        if self._csvfile is None:
+            return None
+        for line in self._reader:
+            if not line:
+                continue
+            row = [int(i) for i in line]
+            if self._next_row is not None and row[0] < self._next_row[0]:
+                raise ValueError(
+                    f'{self.filename}, line {self._reader.line_num}: round '
+                    f'{row[0]} comes after round {self._next_row[0]}; the '
+                    f'file must be sorted by round number '
+                    f'(see sort_arrivals_file)')
+            return row
+        self.close()
+        return None
+
+    def close(self) -> None:
+        """ Close the CSV file. No more arrivals are generated after this.
+        """
+        if self._csvfile is not None:
+            self._csvfile.close()
+            self._csvfile = None
+        self._next_row = None
+
+    def __enter__(self) -> 'StreamingFileArrivals':
+        """ Return this generator, for use in a with statement.
+        """
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """ Close the CSV file at the end of a with statement.
+        """
+        self.close()
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """ Return the new arrivals at round <round_num>.
+
+        Only floors where people arrived are included.
+
+        Raise ValueError if <round_num> is not greater than the round number
+        of the previous call.
+        """
+        if round_num <= self._last_round:
+            raise ValueError(f'round {round_num} requested after round '
+                             f'{self._last_round}; {self.filename} can only '
+                             f'be read forwards')
+        self._last_round = round_num
+        arrivals = {}
+
+        # skip the rows of any rounds that were never requested
+        while self._next_row is not None and self._next_row[0] < round_num:
+            self._next_row = self._read_row()
+
+        while self._next_row is not None and self._next_row[0] == round_num:
+            floors = self._next_row
+            for index in range(1, len(floors) - 1, 2):
+                start, target = floors[index], floors[index + 1]
+                if start in arrivals:
                     arrivals[start].append(Person(start, target))
-                    index += 2
+                else:
+                    arrivals[start] = [Person(start, target)]
+            self._next_row = self._read_row()
+
+        return arrivals
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round, from <round_num> on, in which someone
+        arrives, or None if nobody arrives after <round_num>.
+
+        Rows before <round_num>, and rows with nobody in them, are read past,
+        so this only ever moves forward through the file.
+        """
+        while self._next_row is not None and (self._next_row[0] < round_num or
+                                              len(self._next_row) < 3):
+            self._next_row = self._read_row()
+        return None if self._next_row is None else self._next_row[0]
+
+
+def _read_csv_rows(filename: str) -> Iterator[List[str]]:
+    """ Yield the non-empty rows of the CSV file <filename>, with surrounding
+    whitespace removed from each value.
+    """
+    with open(filename, newline='') as csvfile:
+        for line in csv.reader(csvfile):
+            if line:
+                yield [value.strip() for value in line]
+
+
+def _write_csv_rows(filename: str, rows: Iterable[List[str]]) -> None:
+    """ Write <rows> to the CSV file <filename>.
+    """
+    with open(filename, 'w', newline='') as csvfile:
+        csv.writer(csvfile).writerows(rows)
+
+
+def _row_round(row: List[str]) -> int:
+    """ Return the round number of an arrivals CSV row.
+    """
+    return int(row[0])
+
+
+def sort_arrivals_file(filename: str, sorted_filename: str,
+                       chunk_rows: int = 100000, fan_in: int = 64) -> None:
+    """Write the rows of the arrivals CSV file <filename> to <sorted_filename>,
+    sorted by round number, using a bounded amount of memory.
+
+    This is an external merge sort: at most <chunk_rows> rows are held in
+    memory at once, each sorted chunk is written to a temporary file, and
+    the chunks are then merged, at most <fan_in> files at a time. Rows with
+    the same round number stay in file order. The result can be read by
+    StreamingFileArrivals.
+
+    Preconditions:
+        <filename> refers to a valid arrivals CSV file
+        chunk_rows >= 1
+        fan_in >= 2
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        chunks = []
+        chunk = []
+        for row in _read_csv_rows(filename):
+            chunk.append(row)
+            if len(chunk) == chunk_rows:
+                chunks.append(_spill_chunk(tmpdir, len(chunks), chunk))
+                chunk = []
+        if chunk or not chunks:
+            chunks.append(_spill_chunk(tmpdir, len(chunks), chunk))
+
+        # merge chunks in passes until at most fan_in are left; merging
+        # neighbouring chunks keeps rows of the same round in file order
+        num_files = len(chunks)
+        while len(chunks) > fan_in:
+            merged = []
+            for i in range(0, len(chunks), fan_in):
+                group = chunks[i:i + fan_in]
+                merged_file = os.path.join(tmpdir, f'{num_files}.csv')
+                num_files += 1
+                _merge_chunks(group, merged_file)
+                for chunk_file in group:
+                    os.remove(chunk_file)
+                merged.append(merged_file)
+            chunks = merged
+
+        _merge_chunks(chunks, sorted_filename)
+
+
+def _spill_chunk(tmpdir: str, index: int, chunk: List[List[str]]) -> str:
+    """ Sort <chunk> by round number (stably), write it to a new file in
+    <tmpdir> and return the file's name.
+    """
+    chunk.sort(key=_row_round)
+    chunk_file = os.path.join(tmpdir, f'{index}.csv')
+    _write_csv_rows(chunk_file, chunk)
+    return chunk_file
+
+
+def _merge_chunks(chunk_files: List[str], merged_file: str) -> None:
+    """ Merge the sorted CSV files <chunk_files> into <merged_file>.
+
+    Rows with the same round number are taken from earlier chunk files first.
+    """
+    rows = heapq.merge(*[_read_csv_rows(chunk_file)
+                         for chunk_file in chunk_files], key=_row_round)
+    _write_csv_rows(merged_file, rows)
+
+
+# The binary trace format, all little-endian:
+#   - a header: TRACE_MAGIC, the format version (uint32) and the number of
+#     rounds R covered by the trace (uint32), i.e. one more than the highest
+#     round number with arrivals
+#   - a round offset index: R + 1 uint64 values; the arrivals of round r are
+#     the pairs numbered offsets[r] up to (not including) offsets[r + 1]
+#   - the arrivals: one (start, target) pair of uint32 values per person,
+#     grouped by round and in file order within each round
+TRACE_MAGIC = b'ELEVTRCE'
+TRACE_VERSION = 1
+_TRACE_HEADER = struct.Struct('<8sII')
+
+
+def convert_csv_to_trace(csv_filename: str, trace_filename: str) -> None:
+    """Convert the arrivals CSV file <csv_filename> (in the format read by
+    FileArrivals, like sample_arrivals.csv) into the binary trace file
+    <trace_filename>, read by BinaryFileArrivals.
+
+    The CSV file does not need to be sorted; it is sorted with
+    sort_arrivals_file first, so conversion runs in bounded memory apart
+    from one counter per round.
+
+    Precondition:
+        <csv_filename> refers to a valid arrivals CSV file
+    """
+    counts = array('Q')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sorted_csv = os.path.join(tmpdir, 'sorted.csv')
+        pairs_file = os.path.join(tmpdir, 'pairs.bin')
+        sort_arrivals_file(csv_filename, sorted_csv)
+
+        with open(pairs_file, 'wb') as pairs:
+            for row in _read_csv_rows(sorted_csv):
+                round_num = int(row[0])
+                floors = [int(value) for value in row[1:]]
+                num_pairs = len(floors) // 2
+                if len(counts) <= round_num:
+                    counts.extend([0] * (round_num + 1 - len(counts)))
+                counts[round_num] += num_pairs
+                pairs.write(struct.pack(f'<{2 * num_pairs}I',
+                                        *floors[:2 * num_pairs]))
+
+        offsets = array('Q', [0])
+        for count in counts:
+            offsets.append(offsets[-1] + count)
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+
+        with open(trace_filename, 'wb') as trace, \
+                open(pairs_file, 'rb') as pairs:
+            trace.write(_TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION,
+                                           len(counts)))
+            offsets.tofile(trace)
+            shutil.copyfileobj(pairs, trace)
+
+
+class BinaryFileArrivals(ArrivalGenerator):
+    """Generate arrivals from a binary trace file, written by
+    convert_csv_to_trace.
+
+    The file is memory-mapped rather than read: each round's arrivals are
+    read straight from the mapped pairs, located through the round offset
+    index, so start-up does no parsing and memory use does not depend on the
+    length of the trace. Unlike StreamingFileArrivals, rounds can be
+    generated in any order.
+
+    === Attributes ===
+    max_floor: The maximum floor number for the building.
+    num_people: Always None; the number of arrivals depends on the file.
+    num_rounds: The number of rounds covered by the trace; there are no
+                arrivals at round num_rounds or later.
+    _file: The open trace file.
+    _mmap: The memory map of _file.
+    _offsets: The round offset index, as a view of _mmap.
+    _pairs: The (start, target) floors of all arrivals, flattened, as a view
+            of _mmap.
+
+    === Representation Invariants ===
+    max_floor >= 2
+    num_people is None
+    num_rounds >= 0
+    """
+    max_floor: int
+    num_people: Optional[int]
+    num_rounds: int
+    _file: BinaryIO
+    _mmap: mmap.mmap
+    _offsets: memoryview
+    _pairs: memoryview
+
+    def __init__(self, max_floor: int, filename: str) -> None:
+        """Initialize a new BinaryFileArrivals for the given trace file.
+
+        Raise ValueError if <filename> is not a binary trace file.
+        """
+        ArrivalGenerator.__init__(self, max_floor, None)
+        if sys.byteorder != 'little':
+            raise ValueError('binary traces can only be memory-mapped on '
+                             'little-endian machines')
+        self._file = open(filename, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < _TRACE_HEADER.size:
+            self.close()
+            raise ValueError(f'{filename} is not a binary trace file')
+        magic, version, self.num_rounds = \
+            _TRACE_HEADER.unpack_from(self._mmap, 0)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            self.close()
+            raise ValueError(f'{filename} is not a version {TRACE_VERSION} '
+                             f'binary trace file')
+
+        view = memoryview(self._mmap)
+        pairs_start = _TRACE_HEADER.size + 8 * (self.num_rounds + 1)
+        self._offsets = view[_TRACE_HEADER.size:pairs_start].cast('Q')
+        self._pairs = view[pairs_start:].cast('I')
+        view.release()
+
+    def close(self) -> None:
+        """ Unmap and close the trace file.
+        """
+        for view in (getattr(self, '_offsets', None),
+                     getattr(self, '_pairs', None)):
+            if view is not None:
+                view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def round_pairs(self, round_num: int) -> memoryview:
+        """ Return the flattened (start, target) floors of the arrivals at
+        round <round_num>, as a view of the mapped file (nothing is copied).
+        """
+        if not 0 <= round_num < self.num_rounds:
+            return self._pairs[0:0]
+        return self._pairs[2 * self._offsets[round_num]:
+                           2 * self._offsets[round_num + 1]]
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """ Return the new arrivals at round <round_num>.
 
+        Only floors where people arrived are included.
+        """
+        arrivals = {}
+        pairs = self.round_pairs(round_num)
+        for index in range(0, len(pairs), 2):
+            start, target = pairs[index], pairs[index + 1]
+            if start in arrivals:
+                arrivals[start].append(Person(start, target))
+            else:
+                arrivals[start] = [Person(start, target)]
         return arrivals
 
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round, from <round_num> on, in which someone
+        arrives, or None if nobody arrives after <round_num>.
+
+        The round offsets never decrease, so this is a binary search for the
+        first offset past that of <round_num>.
+        """
+        round_num = max(round_num, 0)
+        if round_num >= self.num_rounds:
+            return None
+        end = bisect_right(self._offsets, self._offsets[round_num],
+                           round_num + 1)
+        return end - 1 if end <= self.num_rounds else None
+
 
 ###############################################################################
 # Elevator moving algorithms
@@ -217,11 +695,79 @@ def return_the_closet_floor(floor_diff: List[int]) -> int:
     return min(tie)  # alternative : tie[0]
 
 
+def closest_waiting_floor(occupied: List[int], floor: int) -> Optional[int]:
+    """ Return the floor in <occupied> other than <floor> that is closest to
+    <floor>, the lower one if there is a tie, or None if there is none.
+
+    === Precondition ===
+    - occupied is in increasing order
+    """
+    below = bisect_left(occupied, floor) - 1
+    above = bisect_right(occupied, floor)
+    if below < 0:
+        return occupied[above] if above < len(occupied) else None
+    if above == len(occupied) or \
+            floor - occupied[below] <= occupied[above] - floor:
+        return occupied[below]
+    return occupied[above]
+
+
+def lowest_waiting_floor(waiting_list: Dict[int, List[Person]]) \
+        -> Optional[int]:
+    """ Return the lowest floor that has at least one person waiting, or None
+    if nobody is waiting.
+
+    The simulations' WaitingFloors keep the floors with people waiting in
+    order, so this is their first one; any other dictionary is scanned.
+    """
+    if isinstance(waiting_list, WaitingFloors):
+        occupied = waiting_list.occupied
+        return occupied[0] if occupied else None
+    for floor in sorted(waiting_list.keys()):
+        if len(waiting_list[floor]) >= 1:
+            return floor
+    return None
+
+
+def next_waiting_floor(waiting_list: Dict[int, List[Person]], floor: int,
+                       step: int) -> Optional[int]:
+    """ Return the floor with at least one person waiting that is closest to
+    <floor>, out of <floor> and the floors beyond it in the direction <step>
+    (1 for up, -1 for down), or None if there is none.
+
+    WaitingFloors are searched by bisection; any other dictionary is scanned.
+    """
+    if isinstance(waiting_list, WaitingFloors):
+        occupied = waiting_list.occupied
+        if step > 0:
+            i = bisect_left(occupied, floor)
+            return occupied[i] if i < len(occupied) else None
+        i = bisect_right(occupied, floor)
+        return occupied[i - 1] if i > 0 else None
+    floors = [other for other in sorted(waiting_list.keys())
+              if len(waiting_list[other]) >= 1 and
+              (other - floor) * step >= 0]
+    if not floors:
+        return None
+    return floors[0] if step > 0 else floors[-1]
+
+
 def give_direction_waiting(waiting_list: Dict[int, List[Person]],
                            elevator: Elevator,
                            max_floor: int) -> Direction:
     """ For shortsighted algorithm! When the elevator is empty!
+
+    The simulations' WaitingFloors keep the floors with people waiting in
+    order, so the closest one is found by bisection; any other dictionary is
+    scanned floor by floor.
     """
+    if isinstance(waiting_list, WaitingFloors):
+        closest = closest_waiting_floor(waiting_list.occupied,
+                                        elevator.track_floor())
+        if closest is None:
+            return Direction.STAY
+        return give_direction(closest, elevator.track_floor())
+
     floor_diff = [max_floor+1, ]  # floor starts from 1
     people_waiting = False
     for floor in sorted(waiting_list.keys()):
@@ -242,20 +788,46 @@ def give_direction_waiting(waiting_list: Dict[int, List[Person]],
 
 def give_direction_in_elevator(elevator: Elevator, max_floor: int) -> Direction:
     """ For shortsighted algorithm! When the elevator is not empty
-    """
-    floor_diff = [max_floor + 1 for i in range(max_floor + 1)]
 
-    for passenger in elevator.passengers:
-        floor_diff[passenger.target] = abs(elevator.track_floor() -
-                                           passenger.target)
-
-    return give_direction(return_the_closet_floor(floor_diff),
-                          elevator.track_floor())
+    The closest target comes from the elevator's index of passengers by
+    target floor, so nothing is allocated per call.
+    """
+    return give_direction(elevator.closest_target(), elevator.track_floor())
 
 
 class MovingAlgorithm:
     """An algorithm to make decisions for moving an elevator at each round.
+
+    === Attributes ===
+    stays_when_idle: True if, when nobody is waiting or riding, this algorithm
+                     always keeps every elevator where it is, without using
+                     randomness or changing anything it remembers. The
+                     simulations skip over idle rounds for such algorithms.
+    decides_independently: True if the direction this algorithm picks for an
+                           elevator depends only on that elevator's floor and
+                           passengers and on which floors have people waiting,
+                           without randomness or memory, and stays the same
+                           as the elevator moves until it reaches a floor
+                           where someone leaves or could board. The
+                           event-driven engine only consults such algorithms
+                           at those floors, or when the floors with people
+                           waiting change.
+
+    === Private Attributes ===
+    _rng: This algorithm's own random stream, or None to use the random
+          module's shared generator (until reseed is called).
     """
+    stays_when_idle = False
+    decides_independently = False
+
+    def __init__(self) -> None:
+        """Initialize a new MovingAlgorithm."""
+        self._rng = None
+
+    def reseed(self, seed: int) -> None:
+        """Give this algorithm its own random stream, seeded with <seed>."""
+        self._rng = random.Random(seed)
+
     def move_elevators(self,
                        elevators: List[Elevator],
                        waiting: Dict[int, List[Person]],
@@ -292,6 +864,7 @@ class RandomAlgorithm(MovingAlgorithm):
         """
 
         list_of_directions = []
+        choice = (self._rng or random).choice
 
         # iterate through all elevators
         for elevator in elevators:
@@ -325,6 +898,8 @@ class PushyPassenger(MovingAlgorithm):
     If the elevator isn't empty, it moves towards the target floor of the
     *first* passenger who boarded the elevator.
     """
+    stays_when_idle = True
+    decides_independently = True
 
     def move_elevators(self,
                        elevators: List[Elevator],
@@ -333,26 +908,18 @@ class PushyPassenger(MovingAlgorithm):
         """ Return a list of directions for all elevators
         """
         directions = []
-        people_waiting = False
+        lowest = lowest_waiting_floor(waiting)
 
         # iterate through all elevators
         for elevator in elevators:
-            # Case 1: if the elevator is empty
+            # Case 1: if the elevator is empty, head for the lowest floor
+            # with people waiting, or stay if there is none
             if len(elevator.passengers) == 0:
-                # iterate the list of waiting passengers on all floors
-                for floor in sorted(waiting.keys()):
-                    # if there is at least one person waiting for elevators
-                    if len(waiting[floor]) >= 1:
-                        directions.append(give_direction(floor,
-                                                         elevator.track_floor()
-                                                         )
-                                          )
-                        # if there is at least one person waiting for elevators
-                        people_waiting = True
-                        break
-                # if there is no person waiting for elevators
-                if not people_waiting:
+                if lowest is None:
                     directions.append(Direction.STAY)
+                else:
+                    directions.append(give_direction(lowest,
+                                                     elevator.track_floor()))
 
             # Case 2: if the elevator is not empty:
             else:
@@ -379,6 +946,8 @@ class ShortSighted(MovingAlgorithm):
 
     In this case, the order in which people boarded does *not* matter.
     """
+    stays_when_idle = True
+    decides_independently = True
 
     def move_elevators(self,
                        elevators: List[Elevator],
@@ -404,12 +973,82 @@ class ShortSighted(MovingAlgorithm):
         return directions
 
 
+class Look(MovingAlgorithm):
+    """A moving algorithm that sweeps each elevator up and down the building,
+    like the LOOK (or elevator) disk scheduling algorithm.
+
+    Each elevator keeps heading the same way as long as there is a stop ahead
+    of it in that direction: the target floor of one of its passengers, or a
+    floor where people are waiting if it has room for them. When there are no
+    more stops ahead it turns around, and if there are none either way it
+    stays still (and keeps its heading for next time).
+
+    Stops ahead are found by bisecting the elevator's sorted target floors
+    and the simulation's sorted floors with people waiting, so a decision
+    does not look at every floor or passenger.
+
+    === Private Attributes ===
+    _headings: the direction each elevator is sweeping in, by its position
+               in the list of elevators (UP for elevators not seen yet)
+    """
+    stays_when_idle = True
+
+    def __init__(self) -> None:
+        """Initialize a new Look algorithm."""
+        MovingAlgorithm.__init__(self)
+        self._headings = []
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """ Return a list of directions for all elevators
+        """
+        if len(self._headings) < len(elevators):
+            self._headings.extend(
+                [Direction.UP] * (len(elevators) - len(self._headings)))
+
+        directions = []
+        for i, elevator in enumerate(elevators):
+            heading = self._headings[i]
+            if self._has_stop(elevator, waiting, heading):
+                directions.append(heading)
+            else:
+                reverse = Direction(-heading.value)
+                if self._has_stop(elevator, waiting, reverse):
+                    self._headings[i] = reverse
+                    directions.append(reverse)
+                else:
+                    directions.append(Direction.STAY)
+
+        # assertion to ensure the elevator does not move out of bound
+        for direction, elevator in zip(directions, elevators):
+            temp = elevator.track_floor() + direction.value
+            assert 1 <= temp <= max_floor
+
+        return directions
+
+    def _has_stop(self, elevator: Elevator,
+                  waiting: Dict[int, List[Person]],
+                  heading: Direction) -> bool:
+        """ Return whether <elevator> has a stop beyond its floor in the
+        direction <heading>.
+        """
+        floor = elevator.track_floor() + heading.value
+        if elevator.next_target(floor, heading.value) is not None:
+            return True
+        return elevator.free_capacity() > 0 and \
+            next_waiting_floor(waiting, floor, heading.value) is not None
+
+
 if __name__ == '__main__':
     # Don't forget to check your work regularly with python_ta!
     import python_ta
     python_ta.check_all(config={
-        'allowed-io': ['__init__'],
-        'extra-imports': ['entities', 'random', 'csv', 'enum'],
+        'allowed-io': ['__init__', '_read_csv_rows', '_write_csv_rows'],
+        'extra-imports': ['entities', 'random', 'csv', 'enum', 'heapq', 'os',
+                          'bisect', 'tempfile', 'mmap', 'shutil', 'struct',
+                          'sys', 'array'],
         'max-nested-blocks': 4,
         'max-attributes': 12,
         'disable': ['R0201']
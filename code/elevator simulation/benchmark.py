@@ -0,0 +1,488 @@
+"""CSC148 Assignment 1 - Benchmarks
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains benchmarks for the simulation. Run it from this directory
+(so that the sample CSV files and images can be found), e.g.
+
+    python benchmark.py startup
+    python benchmark.py suite
+    python benchmark.py suite --save local_baseline.json
+    python benchmark.py suite --baseline local_baseline.json --seconds
+    python benchmark.py throughput --floors 100 --elevators 8 --rate 2
+    python benchmark.py engines --floors 500 --elevators 64 --rate 20
+    python benchmark.py latency --algorithm dispatch
+
+The suite times headless Simulation runs for every combination of moving
+algorithm, number of floors, number of elevators and arrival rate, and
+measures their peak memory. Its results are compared against a baseline, by
+default the committed benchmark_baseline.json (regenerate it with --save after
+a deliberate change): cases whose peak memory grew by more than a threshold
+are reported as regressions, and the command exits with status 1. If there is
+no baseline file, the suite says so.
+
+Peak memory is much the same on any machine, but times are not, so times are
+only compared with --seconds, against a baseline saved with --save on the
+same machine.
+
+The throughput comparison runs one configuration with each moving algorithm
+and reports how many people each got to their target floor, and how long
+their trips took, rather than how fast the simulation ran.
+
+The engine comparison times Simulation and VectorizedSimulation on the same
+configuration and arrivals, to show where the vectorized engine pays off.
+
+The latency check times single calls to a moving algorithm in a busy building
+(by default GroupDispatcher with 64 elevators and 500 floors, every one with
+people waiting), and exits with status 1 if the median call takes longer than
+LATENCY_BUDGET.
+
+Note: this file is for support purposes only, and is not part of your
+submission.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+import algorithms
+from dispatch import GroupDispatcher
+from entities import Elevator, Person, WaitingFloors
+from simulation import Simulation
+from vectorized import BulkRandomArrivals, VectorizedSimulation
+
+# Code run in a fresh interpreter to build (but not run) a small headless
+# simulation. This is what every headless batch worker pays before round 0.
+_HEADLESS_STARTUP = '''
+import algorithms
+from simulation import Simulation
+Simulation({
+    'num_floors': 6,
+    'num_elevators': 6,
+    'elevator_capacity': 3,
+    'num_people_per_round': 2,
+    'arrival_generator': algorithms.RandomArrivals(6, 2),
+    'moving_algorithm': algorithms.RandomAlgorithm(),
+    'visualize': False
+})
+'''
+
+# The same, but paying for pygame the way every run used to: importing the
+# visualizer, initializing SDL and scanning the system fonts up front.
+_EAGER_STARTUP = '''
+import pygame
+import sprites
+import visualizer
+pygame.init()
+sprites.comic_sans()
+''' + _HEADLESS_STARTUP
+
+
+def _time_interpreter(code: str, repeats: int) -> List[float]:
+    """Return the wall-clock times, in seconds, of running <code> in <repeats>
+    fresh Python interpreters.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def benchmark_startup(repeats: int = 5) -> Dict[str, float]:
+    """Return the best-of-<repeats> startup times of a headless simulation,
+    with pygame loaded lazily ('lazy') and eagerly ('eager').
+    """
+    return {
+        'lazy': min(_time_interpreter(_HEADLESS_STARTUP, repeats)),
+        'eager': min(_time_interpreter(_EAGER_STARTUP, repeats))
+    }
+
+
+# The moving algorithms the suite can run, by name
+SUITE_ALGORITHMS = {
+    'random': algorithms.RandomAlgorithm,
+    'pushy': algorithms.PushyPassenger,
+    'short-sighted': algorithms.ShortSighted,
+    'look': algorithms.Look,
+    'dispatch': GroupDispatcher
+}
+# The default grid of the suite
+SUITE_FLOORS = [10, 100, 1000]
+SUITE_ELEVATORS = [1, 8, 64]
+SUITE_RATES = [1, 10]
+# Settings shared by every case of the suite
+SUITE_CAPACITY = 10
+SUITE_SEED = 148
+# Time differences smaller than this are timer noise, never regressions
+NOISE_SECONDS = 0.005
+# The results of the default suite that later runs are compared against
+BASELINE_FILE = 'benchmark_baseline.json'
+# The moving algorithms VectorizedSimulation has array versions of that give
+# exactly the same results as Simulation (its RandomAlgorithm draws from a
+# different random stream)
+ENGINE_ALGORITHMS = ['pushy', 'short-sighted']
+# The most a moving algorithm may take, in seconds, to decide one round
+LATENCY_BUDGET = 0.001
+
+
+def case_name(algorithm: str, num_floors: int, num_elevators: int,
+              rate: int) -> str:
+    """Return the name of the suite case with the given settings, as used in
+    results files.
+    """
+    return f'{algorithm}/floors={num_floors}/elevators={num_elevators}/' \
+           f'rate={rate}'
+
+
+def _case_config(algorithm: str, num_floors: int, num_elevators: int,
+                 rate: int) -> Dict[str, object]:
+    """Return the simulation configuration of a suite case."""
+    return {
+        'num_floors': num_floors,
+        'num_elevators': num_elevators,
+        'elevator_capacity': SUITE_CAPACITY,
+        'num_people_per_round': rate,
+        'arrival_generator': algorithms.RandomArrivals(num_floors, rate),
+        'moving_algorithm': SUITE_ALGORITHMS[algorithm](),
+        'visualize': False,
+        'seed': SUITE_SEED
+    }
+
+
+def benchmark_case(algorithm: str, num_floors: int, num_elevators: int,
+                   rate: int, num_rounds: int, repeats: int) \
+        -> Dict[str, float]:
+    """Return the best-of-<repeats> time, in seconds, of a headless run of
+    <num_rounds> rounds of the given suite case ('seconds'), and its peak
+    memory use in KiB ('peak_kib').
+
+    The memory is measured in a separate run, since tracing allocations slows
+    the simulation down.
+    """
+    times = []
+    for _ in range(repeats):
+        simulation = Simulation(_case_config(algorithm, num_floors,
+                                             num_elevators, rate))
+        start = time.perf_counter()
+        simulation.run(num_rounds)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        Simulation(_case_config(algorithm, num_floors, num_elevators,
+                                rate)).run(num_rounds)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'peak_kib': peak / 1024}
+
+
+def run_suite(algorithm_names: List[str], floors: List[int],
+              elevators: List[int], rates: List[int], num_rounds: int,
+              repeats: int, verbose: bool = False) -> Dict[str, object]:
+    """Run the suite over every combination of the given settings, and
+    return its results: the settings, and the benchmark_case results of each
+    case under 'cases'.
+
+    If <verbose>, print each case's results as it finishes.
+    """
+    cases = {}
+    for algorithm, num_floors, num_elevators, rate in itertools.product(
+            algorithm_names, floors, elevators, rates):
+        name = case_name(algorithm, num_floors, num_elevators, rate)
+        cases[name] = benchmark_case(algorithm, num_floors, num_elevators,
+                                     rate, num_rounds, repeats)
+        if verbose:
+            print(f"{name:<50}{cases[name]['seconds'] * 1000:10.1f} ms"
+                  f"{cases[name]['peak_kib']:12.1f} KiB")
+    return {'num_rounds': num_rounds, 'repeats': repeats, 'cases': cases}
+
+
+def find_regressions(results: Dict[str, object], baseline: Dict[str, object],
+                     threshold: float,
+                     measures: Tuple[str, ...] = ('seconds', 'peak_kib')) \
+        -> List[str]:
+    """Return a description of each regression of <results> compared to
+    <baseline>: each case, present in both, for which one of the <measures>
+    (time, 'seconds', or peak memory, 'peak_kib') grew by more than the
+    fraction <threshold> of its baseline value. Time differences below
+    NOISE_SECONDS are ignored.
+
+    Precondition: results and baseline were run with the same number of
+    rounds.
+    """
+    regressions = []
+    for name, case in results['cases'].items():
+        if name not in baseline['cases']:
+            continue
+        for measure in measures:
+            before = baseline['cases'][name][measure]
+            after = case[measure]
+            if measure == 'seconds' and after - before < NOISE_SECONDS:
+                continue
+            if after > before * (1 + threshold):
+                regressions.append(f'{name}: {measure} {before:.4g} -> '
+                                   f'{after:.4g} (+{after / before - 1:.0%})')
+    return regressions
+
+
+def compare_throughput(algorithm_names: List[str], num_floors: int,
+                       num_elevators: int, rate: int, num_rounds: int) \
+        -> Dict[str, Dict[str, int]]:
+    """Return the statistics of a headless run of <num_rounds> rounds of
+    the suite case with the given settings, for each of the algorithms
+    <algorithm_names>.
+
+    Every algorithm sees the same arrivals, since the cases share a seed.
+    """
+    return {algorithm: Simulation(_case_config(algorithm, num_floors,
+                                               num_elevators, rate)
+                                  ).run(num_rounds)
+            for algorithm in algorithm_names}
+
+
+def compare_engines(algorithm: str, num_floors: int, num_elevators: int,
+                    rate: int, num_rounds: int, repeats: int) \
+        -> Dict[str, float]:
+    """Return the best-of-<repeats> times, in seconds, of headless runs of
+    <num_rounds> rounds of the suite case with the given settings with
+    Simulation ('simulation') and with VectorizedSimulation ('vectorized').
+
+    Both engines get the same arrivals from a BulkRandomArrivals, so neither
+    pays for creating people one at a time. Raise RuntimeError if their
+    statistics differ.
+
+    Precondition: algorithm is in ENGINE_ALGORITHMS.
+    """
+    times = {}
+    stats = {}
+    for name, engine in [('simulation', Simulation),
+                         ('vectorized', VectorizedSimulation)]:
+        times[name] = float('inf')
+        for _ in range(repeats):
+            config = _case_config(algorithm, num_floors, num_elevators, rate)
+            config['arrival_generator'] = BulkRandomArrivals(
+                num_floors, rate, num_rounds)
+            simulation = engine(config)
+            start = time.perf_counter()
+            stats[name] = simulation.run(num_rounds)
+            times[name] = min(times[name], time.perf_counter() - start)
+    if stats['simulation'] != stats['vectorized']:
+        raise RuntimeError(f"engines disagree: Simulation gave "
+                           f"{stats['simulation']}, VectorizedSimulation gave "
+                           f"{stats['vectorized']}")
+    return times
+
+
+def decision_latency(algorithm: str, num_floors: int, num_elevators: int,
+                     num_calls: int) -> Dict[str, float]:
+    """Return the median ('median') and the largest ('max') time, in
+    seconds, of <num_calls> calls to the move_elevators method of the suite
+    algorithm <algorithm>.
+
+    Every floor has someone waiting, every other elevator carries three
+    passengers, and the elevators move as directed between calls, so every
+    call has a decision to make for each elevator.
+
+    Precondition: num_floors >= 2 and num_calls >= 1.
+    """
+    rng = random.Random(SUITE_SEED)
+    waiting = WaitingFloors(num_floors)
+    for floor in range(1, num_floors + 1):
+        target = rng.choice([other for other in range(1, num_floors + 1)
+                             if other != floor])
+        waiting.add(floor, Person(floor, target))
+    elevators = []
+    for i in range(num_elevators):
+        elevator = Elevator(SUITE_CAPACITY, num_floors)
+        elevator.current_floor = rng.randint(1, num_floors)
+        if i % 2 == 1:
+            for _ in range(3):
+                elevator.load(Person(elevator.current_floor,
+                                     rng.randint(1, num_floors)))
+        elevators.append(elevator)
+
+    moving_algorithm = SUITE_ALGORITHMS[algorithm]()
+    times = []
+    for _ in range(num_calls):
+        start = time.perf_counter()
+        directions = moving_algorithm.move_elevators(elevators, waiting,
+                                                     num_floors)
+        times.append(time.perf_counter() - start)
+        for elevator, direction in zip(elevators, directions):
+            elevator.move_floor(direction)
+    return {'median': statistics.median(times), 'max': max(times)}
+
+
+def _run_suite_command(args: argparse.Namespace) -> int:
+    """Run the suite as asked for on the command line, and return the exit
+    status: 1 if there were regressions, and 0 otherwise.
+    """
+    baseline: Optional[Dict[str, object]] = None
+    if not os.path.exists(args.baseline):
+        print(f'no baseline at {args.baseline}: the results will not be '
+              f'compared (save one with --save {args.baseline})')
+    else:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['num_rounds'] != args.rounds:
+            print(f"baseline was run with {baseline['num_rounds']} rounds; "
+                  f"using that instead of {args.rounds}")
+            args.rounds = baseline['num_rounds']
+
+    results = run_suite(args.algorithms, args.floors, args.elevators,
+                        args.rates, args.rounds, args.repeats, verbose=True)
+    if args.save is not None:
+        with open(args.save, 'w') as results_file:
+            json.dump(results, results_file, indent=2)
+
+    if baseline is None:
+        return 0
+    missing = [name for name in results['cases']
+               if name not in baseline['cases']]
+    if missing:
+        print(f'{len(missing)} cases are not in the baseline, and were not '
+              f'compared')
+    measures = ('seconds', 'peak_kib') if args.seconds else ('peak_kib',)
+    regressions = find_regressions(results, baseline, args.threshold,
+                                   measures)
+    for regression in regressions:
+        print('REGRESSION', regression)
+    if not regressions:
+        print(f"no regressions above {args.threshold:.0%} in "
+              f"{', '.join(measures)}")
+    return 1 if regressions else 0
+
+
+def _print_startup(repeats: int) -> None:
+    """Print the startup benchmark results."""
+    results = benchmark_startup(repeats)
+    print(f"headless startup, lazy pygame:  {results['lazy'] * 1000:8.1f} ms")
+    print(f"headless startup, eager pygame: {results['eager'] * 1000:8.1f} ms")
+    print(f"saved per worker:               "
+          f"{(results['eager'] - results['lazy']) * 1000:8.1f} ms")
+
+
+def _print_throughput(args: argparse.Namespace) -> None:
+    """Print the throughput comparison asked for on the command line."""
+    results = compare_throughput(args.algorithms, args.floors, args.elevators,
+                                 args.rate, args.rounds)
+    print(f"{'algorithm':<16}{'arrived':>10}{'completed':>11}"
+          f"{'per round':>11}{'avg time':>10}{'p95 time':>10}")
+    for algorithm, stats in results.items():
+        print(f"{algorithm:<16}{stats['total_people']:>10}"
+              f"{stats['people_completed']:>11}"
+              f"{stats['people_completed'] / args.rounds:>11.2f}"
+              f"{stats['avg_time']:>10}{stats['p95_time']:>10}")
+
+
+def _print_engines(args: argparse.Namespace) -> None:
+    """Print the engine comparison asked for on the command line."""
+    results = compare_engines(args.algorithm, args.floors, args.elevators,
+                              args.rate, args.rounds, args.repeats)
+    print(f"Simulation:           {results['simulation'] * 1000:10.1f} ms")
+    print(f"VectorizedSimulation: {results['vectorized'] * 1000:10.1f} ms")
+    print(f"speedup:              "
+          f"{results['simulation'] / results['vectorized']:10.2f}x")
+
+
+def _run_latency_command(args: argparse.Namespace) -> int:
+    """Print the latency check asked for on the command line, and return
+    the exit status: 1 if the median call is over LATENCY_BUDGET, and 0
+    otherwise.
+    """
+    results = decision_latency(args.algorithm, args.floors, args.elevators,
+                               args.calls)
+    print(f"median call:  {results['median'] * 1000:8.3f} ms")
+    print(f"slowest call: {results['max'] * 1000:8.3f} ms")
+    if results['median'] > LATENCY_BUDGET:
+        print(f'OVER BUDGET of {LATENCY_BUDGET * 1000:.3f} ms')
+        return 1
+    print(f'within budget of {LATENCY_BUDGET * 1000:.3f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulation benchmarks.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    startup = commands.add_parser(
+        'startup', help='time headless startup with lazy and eager pygame')
+    startup.add_argument('--repeats', type=int, default=5)
+
+    suite = commands.add_parser(
+        'suite', help='time headless runs across algorithms and sizes')
+    suite.add_argument('--algorithms', nargs='+',
+                       default=list(SUITE_ALGORITHMS),
+                       choices=list(SUITE_ALGORITHMS))
+    suite.add_argument('--floors', nargs='+', type=int, default=SUITE_FLOORS)
+    suite.add_argument('--elevators', nargs='+', type=int,
+                       default=SUITE_ELEVATORS)
+    suite.add_argument('--rates', nargs='+', type=int, default=SUITE_RATES,
+                       help='people arriving per round')
+    suite.add_argument('--rounds', type=int, default=200)
+    suite.add_argument('--repeats', type=int, default=3)
+    suite.add_argument('--save', metavar='FILE',
+                       help='write the results to FILE as JSON')
+    suite.add_argument('--baseline', metavar='FILE', default=BASELINE_FILE,
+                       help='compare the results against a saved run')
+    suite.add_argument('--threshold', type=float, default=0.10,
+                       help='fraction of growth reported as a regression')
+    suite.add_argument('--seconds', action='store_true',
+                       help='compare times too; only meaningful against a '
+                            'baseline saved on this machine')
+
+    throughput = commands.add_parser(
+        'throughput', help='compare how many people each algorithm delivers')
+    throughput.add_argument('--algorithms', nargs='+',
+                            default=list(SUITE_ALGORITHMS),
+                            choices=list(SUITE_ALGORITHMS))
+    throughput.add_argument('--floors', type=int, default=100)
+    throughput.add_argument('--elevators', type=int, default=8)
+    throughput.add_argument('--rate', type=int, default=2,
+                            help='people arriving per round')
+    throughput.add_argument('--rounds', type=int, default=5000)
+
+    engines = commands.add_parser(
+        'engines', help='time Simulation against VectorizedSimulation')
+    engines.add_argument('--algorithm', default='short-sighted',
+                         choices=ENGINE_ALGORITHMS)
+    engines.add_argument('--floors', type=int, default=500)
+    engines.add_argument('--elevators', type=int, default=64)
+    engines.add_argument('--rate', type=int, default=20,
+                         help='people arriving per round')
+    engines.add_argument('--rounds', type=int, default=5000)
+    engines.add_argument('--repeats', type=int, default=3)
+
+    latency = commands.add_parser(
+        'latency', help='time single decisions of a moving algorithm')
+    latency.add_argument('--algorithm', default='dispatch',
+                         choices=list(SUITE_ALGORITHMS))
+    latency.add_argument('--floors', type=int, default=500)
+    latency.add_argument('--elevators', type=int, default=64)
+    latency.add_argument('--calls', type=int, default=300)
+
+    args = parser.parse_args()
+    if args.command == 'startup':
+        _print_startup(args.repeats)
+    elif args.command == 'suite':
+        sys.exit(_run_suite_command(args))
+    elif args.command == 'throughput':
+        _print_throughput(args)
+    elif args.command == 'engines':
+        _print_engines(args)
+    elif args.command == 'latency':
+        sys.exit(_run_latency_command(args))
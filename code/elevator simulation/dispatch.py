@@ -0,0 +1,190 @@
+"""CSC148 Assignment 1 - Group Dispatch
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains GroupDispatcher, a moving algorithm that decides for all
+the elevators together.
+
+With PushyPassenger or ShortSighted, each empty elevator picks a floor on its
+own, so several of them often chase the same floor while people on other
+floors are left waiting. GroupDispatcher instead assigns each floor with
+people waiting to (at most) one elevator, keeping the estimated time it takes
+to serve the floors low, and sends each empty elevator to the floor it was
+assigned.
+
+The estimates are kept in a NumPy cost matrix with one row per elevator and
+one column per floor. A row only changes when its elevator moves, or people
+board or leave it, so between rounds only those rows are recomputed.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import algorithms
+from algorithms import Direction
+from entities import Elevator, Person, WaitingFloors
+
+# The cost of a floor for an elevator that cannot serve it
+_UNREACHABLE = np.iinfo(np.int32).max // 4
+
+
+class GroupDispatcher(algorithms.MovingAlgorithm):
+    """A moving algorithm that assigns each floor with people waiting to one
+    elevator.
+
+    The cost of serving a floor with an elevator is the number of floors it
+    has to travel to get there: straight there for an empty elevator, and
+    for an elevator with passengers, via the closest of their target floors
+    unless the floor is on the way. Full elevators cannot serve any floor.
+    Floors are assigned greedily, cheapest (elevator, floor) pair first, and
+    each elevator gets at most one floor.
+
+    An elevator with passengers heads for the closest of their target floors
+    (as in ShortSighted), picking up people on its way. An empty elevator
+    heads for the floor it was assigned, or stays still if it has none.
+
+    === Private Attributes ===
+    _floors: the floor numbers 0 to max_floor, for computing costs
+    _costs: _costs[i, floor] is the cost of serving <floor> with the i-th
+            elevator; column 0 is unused
+    _row_keys: for each elevator, the (floor, target floor or -1, has room)
+               its row of _costs was computed for
+    """
+    stays_when_idle = True
+
+    def __init__(self) -> None:
+        """Initialize a new GroupDispatcher."""
+        algorithms.MovingAlgorithm.__init__(self)
+        self._floors = np.zeros(0, dtype=np.int32)
+        self._costs = np.zeros((0, 0), dtype=np.int32)
+        self._row_keys = []
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """ Return a list of directions for all elevators
+        """
+        self._update_costs(elevators, max_floor)
+        assignment = self._assign(_occupied_floors(waiting))
+
+        directions = []
+        for i, elevator in enumerate(elevators):
+            if len(elevator.passengers) != 0:
+                directions.append(algorithms.give_direction_in_elevator(
+                    elevator, max_floor))
+            elif i in assignment:
+                directions.append(algorithms.give_direction(
+                    assignment[i], elevator.track_floor()))
+            else:
+                directions.append(Direction.STAY)
+
+        # assertion to ensure the elevator does not move out of bound
+        for direction, elevator in zip(directions, elevators):
+            temp = elevator.track_floor() + direction.value
+            assert 1 <= temp <= max_floor
+
+        return directions
+
+    def _update_costs(self, elevators: List[Elevator],
+                      max_floor: int) -> None:
+        """Recompute the rows of the cost matrix whose elevator changed since
+        the last call, or the whole matrix if the building did.
+        """
+        if self._costs.shape != (len(elevators), max_floor + 1):
+            self._floors = np.arange(max_floor + 1, dtype=np.int32)
+            self._costs = np.zeros((len(elevators), max_floor + 1),
+                                   dtype=np.int32)
+            self._row_keys = [None] * len(elevators)
+
+        changed = []
+        keys = []
+        for i, elevator in enumerate(elevators):
+            key = _row_key(elevator)
+            if key != self._row_keys[i]:
+                self._row_keys[i] = key
+                changed.append(i)
+                keys.append(key)
+        if not changed:
+            return
+
+        here, target, has_room = (np.array(column, dtype=np.int32)
+                                  for column in zip(*keys))
+        here = here[:, None]
+        target = target[:, None]
+        floors = self._floors[None, :]
+        costs = np.abs(floors - here)
+        # floors that are not on the way cost the detour through the target
+        has_target = target >= 0
+        off_route = has_target & ((floors < np.minimum(here, target)) |
+                                  (floors > np.maximum(here, target)))
+        detour = np.abs(target - here) + np.abs(floors - target)
+        costs = np.where(off_route, detour, costs)
+        costs[has_room == 0] = _UNREACHABLE
+        self._costs[changed] = costs
+
+    def _assign(self, occupied: List[int]) -> Dict[int, int]:
+        """Return a dictionary mapping the index of each elevator that was
+        assigned one of the floors <occupied> to its floor.
+
+        This is the greedy assignment (cheapest pair first), computed in
+        batches: a pair that is the cheapest both for its elevator and for
+        its floor is one that greedy would take, so all such pairs are
+        assigned at once, and their rows and columns dropped, until nothing
+        is left to assign.
+        """
+        if not occupied or len(self._costs) == 0:
+            return {}
+        rows = np.arange(len(self._costs))
+        columns = np.array(occupied, dtype=np.intp)
+        costs = self._costs[:, columns]
+
+        assignment = {}
+        while len(rows) != 0 and len(columns) != 0:
+            best_column = costs.argmin(axis=1)
+            best_row = costs.argmin(axis=0)
+            row_indexes = np.arange(len(rows))
+            mutual = (best_row[best_column] == row_indexes) & \
+                (costs[row_indexes, best_column] < _UNREACHABLE)
+            if not mutual.any():
+                break
+            assignment.update(zip(rows[mutual].tolist(),
+                                  columns[best_column[mutual]].tolist()))
+            keep_rows = ~mutual
+            keep_columns = np.ones(len(columns), dtype=bool)
+            keep_columns[best_column[mutual]] = False
+            rows = rows[keep_rows]
+            columns = columns[keep_columns]
+            costs = costs[keep_rows][:, keep_columns]
+        return assignment
+
+
+def _row_key(elevator: Elevator) -> Tuple[int, int, bool]:
+    """Return what <elevator>'s row of the cost matrix depends on: its floor,
+    the target floor it is heading for (-1 if it is empty), and whether it
+    has room for anyone.
+    """
+    target = -1
+    if len(elevator.passengers) != 0:
+        target = elevator.closest_target()
+    return (elevator.track_floor(), target, elevator.free_capacity() > 0)
+
+
+def _occupied_floors(waiting: Dict[int, List[Person]]) -> List[int]:
+    """Return the floors in <waiting> with people waiting, in increasing
+    order.
+    """
+    if isinstance(waiting, WaitingFloors):
+        return waiting.occupied
+    return [floor for floor in sorted(waiting) if len(waiting[floor]) != 0]
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['algorithms', 'entities', 'numpy'],
+        'disable': ['R0201']
+    })
@@ -15,50 +15,131 @@ methods we have provided. However, you can (and should) add new attributes,
 and of course you'll have to implement the methods we've provided, as well
 as add your own methods to complete this assignment.
 
-Finally, note that Person and Elevator each inherit from a kind of sprite found
-in sprites.py; this is to enable their instances to be visualized properly.
-You may not change sprites.py, but are responsible for reading the documentation
-to understand these classes, as well as the abstract methods your classes must
-implement.
+Finally, note that Person and Elevator are plain Python objects and do not
+depend on pygame. When a simulation is visualized, the Visualizer attaches a
+sprite from sprites.py to each entity (through its sprite attribute); in a
+headless simulation (config['visualize'] is False) no sprite is ever built, so
+creating people and elevators costs no image loading or scaling.
 """
 from __future__ import annotations
-from typing import List
-from sprites import PersonSprite, ElevatorSprite
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from typing import Any, Dict, List, Optional
 
 
-class Elevator(ElevatorSprite):
+class Clock:
+    """The round a simulation is currently counting wait times for.
+
+    A clock is shared by a simulation and the people in it: each person
+    records the round they arrived in, and derives their wait time from the
+    clock on demand, so the simulation never has to update every person each
+    round.
+
+    === Attributes ===
+    round_num: the current round
+
+    === Representation invariants ===
+    round_num >= 0
+    """
+    round_num: int
+
+    def __init__(self) -> None:
+        self.round_num = 0
+
+
+class Elevator:
     """An elevator in the elevator simulation.
 
     Remember to add additional documentation to this class docstring
     as you add new attributes (and representation invariants).
 
     === Attributes ===
-    passengers: A list of the people currently on this elevator
+    passengers: A list of the people currently on this elevator, in the
+                order they boarded. Use load and unload to change it.
 
     user_defined attributes:
     current_floor: the floor that the elevator is on currently
     elevator_capacity: the maximum number of people the elevator can take
     num_floors: the number of floors
+    sprite: the ElevatorSprite drawing this elevator, attached by the
+            Visualizer; None when the simulation is not visualized
+    _passengers_by_target: the passengers, grouped by target floor (each
+                           group in boarding order)
+    _target_floors: the keys of _passengers_by_target, in increasing order
     === Representation invariants ===
     elevator_capacity >= 1
     num_floor >= 2
+    every passenger appears in exactly one group of _passengers_by_target,
+    the one for their target floor, and every group is non-empty
     """
     passengers: List[Person]
     current_floor: int
     elevator_capacity: int
     num_floor: int
+    sprite: Optional[Any]
+    _passengers_by_target: Dict[int, List[Person]]
+    _target_floors: List[int]
 
     def __init__(self, capacity: int, floors: int) -> None:
-        ElevatorSprite.__init__(self)
         self.current_floor = 1
         self.elevator_capacity = capacity
         self.passengers = []
         self.num_floor = floors
+        self.sprite = None
+        self._passengers_by_target = {}
+        self._target_floors = []
 
     def load(self, passenger: Person) -> None:
         """ Load person into the elevator.
         """
         self.passengers.append(passenger)
+        if passenger.target in self._passengers_by_target:
+            self._passengers_by_target[passenger.target].append(passenger)
+        else:
+            self._passengers_by_target[passenger.target] = [passenger]
+            insort(self._target_floors, passenger.target)
+
+    def unload(self, floor: int) -> List[Person]:
+        """ Remove and return the passengers whose target is <floor>, in the
+        order they boarded.
+        """
+        leaving = self._passengers_by_target.pop(floor, None)
+        if leaving is None:
+            return []
+        del self._target_floors[bisect_left(self._target_floors, floor)]
+        # passengers is the list the starter code exposes, so it is filtered
+        # in place; this only happens when someone leaves, and the list holds
+        # at most elevator_capacity people
+        self.passengers[:] = [passenger for passenger in self.passengers
+                              if passenger.target != floor]
+        return leaving
+
+    def closest_target(self) -> int:
+        """ Return the passengers' target floor closest to the current floor,
+        or the lower one if two are equally close.
+
+        Precondition: the elevator is not empty.
+        """
+        targets = self._target_floors
+        i = bisect_left(targets, self.current_floor)
+        if i == len(targets):
+            return targets[-1]
+        if i == 0 or (targets[i] - self.current_floor <
+                      self.current_floor - targets[i - 1]):
+            return targets[i]
+        return targets[i - 1]
+
+    def next_target(self, floor: int, step: int) -> Optional[int]:
+        """ Return the passengers' target floor closest to <floor>, out of
+        those at <floor> or beyond it in the direction <step> (1 for up, -1 for
+        down), or None if there is none.
+        """
+        targets = self._target_floors
+        if step > 0:
+            i = bisect_left(targets, floor)
+            return targets[i] if i < len(targets) else None
+        i = bisect_right(targets, floor)
+        return targets[i - 1] if i > 0 else None
 
     def move_floor(self, direction: Direction) -> None:
         """ Move the elevator by one floor.
@@ -75,6 +156,11 @@ class Elevator(ElevatorSprite):
         """
         return len(self.passengers)
 
+    def free_capacity(self) -> int:
+        """ Return the number of people that can still board the elevator.
+        """
+        return self.elevator_capacity - self.track_num_passengers()
+
     def fullness(self) -> float:
         """Return the fraction that this elevator is filled.
 
@@ -84,13 +170,25 @@ class Elevator(ElevatorSprite):
         return self.track_num_passengers() / self.elevator_capacity
 
 
-class Person(PersonSprite):
+class Person:
     """A person in the elevator simulation.
 
     === Attributes ===
     start: the floor this person started on
     target: the floor this person wants to go to
     wait_time: the number of rounds this person has been waiting
+    sprite: the PersonSprite drawing this person, attached by the Visualizer;
+            None when the simulation is not visualized
+
+    user_defined attributes:
+    _clock: the clock of the simulation this person arrived in, or None if
+            they have not arrived in a simulation yet, or have reached their
+            target floor
+    _arrival_round: the round of _clock in which this person arrived
+    _extra_wait: rounds of waiting added by increase_wait_time (or by setting
+                 wait_time) on top of the rounds elapsed since arrival; once
+                 this person has reached their target floor, their whole wait
+                 time
 
     === Representation invariants ===
     start >= 1
@@ -99,20 +197,61 @@ class Person(PersonSprite):
     """
     start: int
     target: int
-    wait_time: int
+    sprite: Optional[Any]
+    _clock: Optional[Clock]
+    _arrival_round: int
+    _extra_wait: int
 
     def __init__(self, start: int, target: int) -> None:
         self.start = start
         self.target = target
-        self.wait_time = 0
-        PersonSprite.__init__(self)
+        self.sprite = None
+        self._clock = None
+        self._arrival_round = 0
+        self._extra_wait = 0
+
+    @property
+    def wait_time(self) -> int:
+        """Return the number of rounds this person has been waiting.
+
+        This is the number of rounds elapsed on the simulation's clock since
+        this person arrived, up to when they reached their target floor.
+        """
+        if self._clock is None:
+            return self._extra_wait
+        return self._clock.round_num - self._arrival_round + self._extra_wait
+
+    @wait_time.setter
+    def wait_time(self, wait_time: int) -> None:
+        """Set the number of rounds this person has been waiting."""
+        self._extra_wait += wait_time - self.wait_time
+
+    def start_waiting(self, clock: Clock) -> None:
+        """ Record that this person arrives at the current round of <clock>.
+
+        From then on, this person's wait time grows by one each time the clock
+        advances by a round.
+        """
+        self._clock = clock
+        self._arrival_round = clock.round_num
+        self._extra_wait = 0
+
+    def finish_waiting(self) -> None:
+        """ Record that this person has reached their target floor.
+
+        Their wait time stays what it is now, however far the clock advances.
+        """
+        self._extra_wait = self.wait_time
+        self._clock = None
 
     def increase_wait_time(self):
         """ Increase the wait time of the passenger
         Each person’s wait_time time increases both when they’re waiting at
         a floor, and when they’re traveling on an elevator.
+
+        A simulation advances its clock instead of calling this method.
         """
-        self.wait_time += 1
+        self._extra_wait += 1
 
     def get_anger_level(self) -> int:
         """Return this person's anger level.
@@ -125,23 +264,80 @@ class Person(PersonSprite):
             - Level 3: waiting 7-8 rounds
             - Level 4: waiting >= 9 rounds
         """
-        if self.wait_time <= 2:
+        wait_time = self.wait_time
+        if wait_time <= 2:
             return 0
-        elif 3 <= self.wait_time <= 4:
+        elif 3 <= wait_time <= 4:
             return 1
-        elif 5 <= self.wait_time <= 6:
+        elif 5 <= wait_time <= 6:
             return 2
-        elif 7 <= self.wait_time <= 8:
+        elif 7 <= wait_time <= 8:
             return 3
         else:
             return 4
 
 
+class FloorQueue(deque):
+    """The people waiting for an elevator on one floor, first come first served.
+
+    A FloorQueue is a deque of Person, so moving algorithms can use it like
+    the list of people waiting on a floor (len, iteration, indexing), while
+    boarding removes people from the front in O(1) each.
+    """
+
+    def pop_front(self, n: int) -> List[Person]:
+        """ Remove and return the (up to) <n> people who have waited longest,
+        in the order they arrived.
+        """
+        return [self.popleft() for _ in range(min(n, len(self)))]
+
+
+class WaitingFloors(dict):
+    """The people waiting for an elevator in a building, by floor.
+
+    A WaitingFloors is a dictionary mapping each floor number to the
+    FloorQueue of people waiting there, so moving algorithms can use it like
+    any such dictionary. It also keeps the floors where people are waiting in
+    order, so an algorithm can find the nearest one by bisection instead of
+    looking at every floor. People must be added and boarded through add and
+    board for that order to stay right.
+
+    === Attributes ===
+    occupied: the floors where at least one person is waiting, in increasing
+              order
+    """
+    occupied: List[int]
+
+    def __init__(self, num_floors: int) -> None:
+        """Initialize empty queues for floors 1 to <num_floors>."""
+        dict.__init__(self, {floor: FloorQueue()
+                             for floor in range(1, num_floors + 1)})
+        self.occupied = []
+
+    def add(self, floor: int, person: Person) -> None:
+        """Add <person> to the back of the queue on <floor>."""
+        queue = self[floor]
+        if not queue:
+            insort(self.occupied, floor)
+        queue.append(person)
+
+    def board(self, floor: int, n: int) -> List[Person]:
+        """Remove and return the (up to) <n> people who have waited longest on
+        <floor>, in the order they arrived.
+        """
+        queue = self[floor]
+        if not queue:
+            return []
+        people = queue.pop_front(n)
+        if not queue:
+            del self.occupied[bisect_left(self.occupied, floor)]
+        return people
+
+
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['sprites'],
         'max-nested-blocks': 4,
         'max-attributes': 12,
         'disable': ['R0201']
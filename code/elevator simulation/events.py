@@ -0,0 +1,354 @@
+"""CSC148 Assignment 1 - Event-Driven Simulation
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains EventSimulation, an alternative to the Simulation class
+in simulation.py that is driven by events instead of a fixed round loop.
+
+Simulation touches every elevator in every round. But with a moving algorithm
+whose decisions are independent for each elevator (see
+MovingAlgorithm.decides_independently), an elevator heading somewhere keeps
+heading there until it reaches a floor where a passenger leaves or someone
+could board, or until the floors with people waiting change. EventSimulation
+keeps a priority queue of the next such event for each elevator, plus the
+next round with arrivals, and only runs the rounds that have events, and in
+them only the elevators involved. Between events, an elevator's floor is
+worked out from where it was and the direction it was heading.
+
+The results are the same as Simulation's. With other moving algorithms, every
+elevator has an event in every round, so the engine does what Simulation
+does.
+"""
+import heapq
+from typing import Any, Dict, List, Set
+
+import algorithms
+from algorithms import Direction
+from entities import Clock, Elevator, WaitingFloors
+from metrics import TripTimeAccumulator
+
+
+class EventSimulation:
+    """A simulation that only runs the rounds and elevators that have events.
+
+    === Attributes ===
+    arrival_generator: the algorithm used to generate new arrivals.
+    elevators: a list of the elevators in the simulation. Between events, an
+               elevator's current_floor is where it was at the start of the
+               round in _since, not necessarily where it is now.
+    moving_algorithm: the algorithm used to decide how to move elevators
+    num_floors: the number of floors
+    waiting: a dictionary of people waiting for an elevator
+             (keys are floor numbers, values are the FloorQueue of people
+             waiting on that floor, in arrival order), which also keeps the
+             floors with people waiting in order
+    num_iterations: the number of simulation rounds that took place
+    total_people: the number of people that arrived at some point during the
+                  simulation
+    people_completed: the number of people who reached their target floor
+    max_time: the maximum time someone spent before reaching their target
+              floor, or -1 if nobody has
+    trip_times: a summary of the time each person who reached their target
+                floor spent doing so
+    rounds_run: the number of rounds that had events, and were run
+
+    === Private Attributes ===
+    _clock: the clock people's wait times are measured against; it is set to
+            each round as it is run
+    _independent: whether the moving algorithm decides independently for
+                  each elevator; if not, every elevator has an event in
+                  every round
+    _direction: the direction each elevator is heading in
+    _since: the round at whose start each elevator was on its current_floor
+    _next_event: the round of each elevator's next event, or None if it has
+                 none (it is staying still until the waiting floors change)
+    _events: a heap of (round, elevator index) entries; an entry is stale,
+             and ignored, unless it matches the elevator's _next_event
+    _profiler: the profiler enabled while the simulation runs, or None
+
+    === Representation Invariants ===
+    Every elevator that would have a passenger leave, or could board someone,
+    or would change direction at the start of some round has an event at or
+    before that round.
+    """
+    arrival_generator: algorithms.ArrivalGenerator
+    elevators: List[Elevator]
+    moving_algorithm: algorithms.MovingAlgorithm
+    num_floors: int
+    waiting: WaitingFloors
+    num_iterations: int
+    total_people: int
+    people_completed: int
+    max_time: int
+    trip_times: TripTimeAccumulator
+    rounds_run: int
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        """Initialize a new simulation using the given configuration.
+
+        The configuration has the same keys as for Simulation. Raise
+        ValueError if config['visualize'] is True, or if config asks for
+        per-round metrics or stage timings, which need every round to be run.
+        """
+        if config['visualize']:
+            raise ValueError('EventSimulation cannot be visualized')
+        for key in ['round_metrics', 'stage_timings']:
+            if config.get(key):
+                raise ValueError(f'EventSimulation does not support {key}')
+
+        algorithms.seed_streams(config)
+        self.arrival_generator = config['arrival_generator']
+        self.moving_algorithm = config['moving_algorithm']
+        self.num_floors = config['num_floors']
+        self.elevators = [Elevator(config['elevator_capacity'],
+                                   config['num_floors'])
+                          for _ in range(config['num_elevators'])]
+        self.waiting = WaitingFloors(config['num_floors'])
+        self.num_iterations = 0
+        self.total_people = 0
+        self.people_completed = 0
+        self.max_time = -1
+        self.trip_times = TripTimeAccumulator()
+        self.rounds_run = 0
+
+        self._clock = Clock()
+        self._independent = self.moving_algorithm.decides_independently
+        self._direction = [Direction.STAY] * len(self.elevators)
+        self._since = [0] * len(self.elevators)
+        # every elevator decides in round 0
+        self._next_event = [0] * len(self.elevators)
+        self._events = [(0, i) for i in range(len(self.elevators))]
+        self._profiler = config.get('profiler')
+
+    def run(self, num_rounds: int) -> Dict[str, Any]:
+        """Run the simulation for the given number of rounds.
+
+        Return the same statistics as Simulation.run.
+
+        Precondition: num_rounds >= 1.
+        """
+        self.num_iterations = num_rounds
+        if self._profiler is not None:
+            self._profiler.enable()
+        try:
+            self._run_events(num_rounds)
+        finally:
+            if self._profiler is not None:
+                self._profiler.disable()
+
+        for i in range(len(self.elevators)):
+            self._place(i, num_rounds)
+        return self._calculate_stats()
+
+    def _run_events(self, num_rounds: int) -> None:
+        """Run every round before <num_rounds> that has an event."""
+        next_arrival = self._next_arrival_round(0, num_rounds)
+        while True:
+            round_num = min(next_arrival, self._next_event_round(num_rounds))
+            if round_num >= num_rounds:
+                return
+            self.rounds_run += 1
+            self._clock.round_num = round_num
+
+            new_floors = []
+            if round_num == next_arrival:
+                new_floors = self._generate_arrivals(round_num)
+                next_arrival = self._next_arrival_round(round_num + 1,
+                                                        num_rounds)
+
+            active = self._pop_events(round_num)
+            if new_floors:
+                # elevators passing a floor where people just started waiting
+                # stop for them
+                for i, elevator in enumerate(self.elevators):
+                    if i not in active and elevator.free_capacity() > 0:
+                        self._place(i, round_num)
+                        if self.waiting[elevator.current_floor]:
+                            active.add(i)
+            ordered = sorted(active)
+            self._handle_leaving(ordered)
+            emptied_floor = self._handle_boarding(ordered)
+
+            if new_floors or emptied_floor:
+                # the floors with people waiting changed: every elevator that
+                # could pick someone up may head somewhere else
+                active.update(i for i, elevator in enumerate(self.elevators)
+                              if elevator.free_capacity() > 0)
+            self._move_elevators(sorted(active), round_num)
+
+    ############################################################################
+    # Events
+    ############################################################################
+
+    def _next_arrival_round(self, round_num: int, num_rounds: int) -> int:
+        """Return the first round, from <round_num> on, that may have
+        arrivals, or <num_rounds> if there is none before it.
+        """
+        next_round = self.arrival_generator.next_arrival_round(round_num)
+        if next_round is None:
+            return num_rounds
+        return min(next_round, num_rounds)
+
+    def _next_event_round(self, num_rounds: int) -> int:
+        """Return the round of the earliest elevator event, or <num_rounds>
+        if there is none, dropping stale entries from the top of the heap.
+        """
+        events = self._events
+        while events and self._next_event[events[0][1]] != events[0][0]:
+            heapq.heappop(events)
+        return events[0][0] if events else num_rounds
+
+    def _pop_events(self, round_num: int) -> Set[int]:
+        """Remove the events at round <round_num> from the heap, and return
+        the indexes of their elevators.
+        """
+        active = set()
+        events = self._events
+        while events and events[0][0] == round_num:
+            _, i = heapq.heappop(events)
+            if self._next_event[i] == round_num:
+                active.add(i)
+                self._next_event[i] = None
+        return active
+
+    def _schedule(self, i: int, round_num: int) -> None:
+        """Schedule the next event of elevator <i>, which has just decided
+        its direction in round <round_num>.
+
+        The event is the first round in which the elevator reaches a floor
+        where one of its passengers leaves, or (if it has room) where people
+        are waiting. An elevator staying still has no event.
+        """
+        if not self._independent:
+            self._push_event(i, round_num + 1)
+            return
+        direction = self._direction[i]
+        if direction == Direction.STAY:
+            return
+
+        elevator = self.elevators[i]
+        step = direction.value
+        floor = elevator.current_floor + step
+        distances = []
+        target = elevator.next_target(floor, step)
+        if target is not None:
+            distances.append(abs(target - floor))
+        if elevator.free_capacity() > 0:
+            waiting_floor = algorithms.next_waiting_floor(self.waiting,
+                                                          floor, step)
+            if waiting_floor is not None:
+                distances.append(abs(waiting_floor - floor))
+        # an elevator always heads for a passenger's target or a waiting
+        # floor; deciding again next round is safe if it does not
+        self._push_event(i, round_num + 1 + min(distances, default=0))
+
+    def _push_event(self, i: int, round_num: int) -> None:
+        """Make round <round_num> the next event of elevator <i>."""
+        self._next_event[i] = round_num
+        heapq.heappush(self._events, (round_num, i))
+
+    def _place(self, i: int, round_num: int) -> None:
+        """Bring elevator <i>'s current_floor up to the start of round
+        <round_num>.
+        """
+        elevator = self.elevators[i]
+        elevator.current_floor += \
+            self._direction[i].value * (round_num - self._since[i])
+        self._since[i] = round_num
+
+    ############################################################################
+    # Stages of a round
+    ############################################################################
+
+    def _generate_arrivals(self, round_num: int) -> List[int]:
+        """Add the arrivals at round <round_num> to the waiting people, and
+        return the floors where nobody was waiting before.
+        """
+        new_floors = []
+        arrivals = self.arrival_generator.generate(round_num)
+        for floor, people in arrivals.items():
+            if people and not self.waiting[floor]:
+                new_floors.append(floor)
+            for person in people:
+                person.start_waiting(self._clock)
+                self.waiting.add(floor, person)
+                self.total_people += 1
+        return new_floors
+
+    def _handle_leaving(self, active: List[int]) -> None:
+        """Let the passengers of the elevators <active> who are on their
+        target floor leave.
+        """
+        for i in active:
+            self._place(i, self._clock.round_num)
+            elevator = self.elevators[i]
+            for passenger in elevator.unload(elevator.current_floor):
+                passenger.finish_waiting()
+                wait_time = passenger.wait_time
+                self.trip_times.add(wait_time)
+                self.people_completed += 1
+                self.max_time = max(self.max_time, wait_time)
+
+    def _handle_boarding(self, active: List[int]) -> bool:
+        """Board waiting people onto the elevators <active>, in order, and
+        return whether a floor was left with nobody waiting.
+        """
+        emptied_floor = False
+        for i in active:
+            elevator = self.elevators[i]
+            floor = elevator.current_floor
+            if not self.waiting[floor]:
+                continue
+            for passenger in self.waiting.board(floor,
+                                                elevator.free_capacity()):
+                elevator.load(passenger)
+            if not self.waiting[floor]:
+                emptied_floor = True
+        return emptied_floor
+
+    def _move_elevators(self, deciding: List[int], round_num: int) -> None:
+        """Ask the moving algorithm for the directions of the elevators
+        <deciding>, and schedule their next events.
+        """
+        if not deciding:
+            return
+        for i in deciding:
+            self._place(i, round_num)
+        directions = self.moving_algorithm.move_elevators(
+            [self.elevators[i] for i in deciding], self.waiting,
+            self.num_floors)
+        for i, direction in zip(deciding, directions):
+            self._direction[i] = direction
+            self._schedule(i, round_num)
+
+    ############################################################################
+    # Statistics calculations
+    ############################################################################
+
+    def _calculate_stats(self) -> Dict[str, int]:
+        """Report the statistics for the current run of this simulation, with
+        the same keys and values as Simulation._calculate_stats.
+        """
+        return {
+            'num_iterations': self.num_iterations,
+            'total_people': self.total_people,
+            'people_completed': self.people_completed,
+            'max_time': self.max_time,
+            'min_time': self.trip_times.minimum,
+            'avg_time': self.trip_times.mean(),
+            'p50_time': self.trip_times.percentile(50),
+            'p95_time': self.trip_times.percentile(95),
+            'p99_time': self.trip_times.percentile(99)
+        }
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['algorithms', 'entities', 'heapq', 'metrics'],
+        'max-attributes': 20,
+        'disable': ['R0201']
+    })
@@ -0,0 +1,319 @@
+"""CSC148 Assignment 1 - Simulation Metrics
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains the accumulators the simulations use to collect
+statistics while they run, in constant memory however long the run is, the
+writer that records what happened in each round of a run, and the timer that
+measures how long each stage of a round takes.
+"""
+import csv
+import functools
+import json
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+# Trip times below this are counted exactly, one histogram slot per time
+EXACT_LIMIT = 4096
+# Longer trip times are counted in buckets this many per doubling, so a
+# percentile that falls among them is within about 1% of the true value
+BUCKETS_PER_DOUBLING = 64
+
+
+class TripTimeAccumulator:
+    """A summary of the trip times of the people who reached their target
+    floor.
+
+    Only counts and a fixed-size histogram are kept, not the trip times
+    themselves, so memory does not grow with the number of people.
+
+    === Attributes ===
+    count: the number of trip times added
+    total: the sum of the trip times added
+    minimum: the smallest trip time added, or -1 if there are none
+    maximum: the largest trip time added, or -1 if there are none
+
+    === Private Attributes ===
+    _exact: _exact[t] is the number of trip times equal to t, for
+            t < EXACT_LIMIT
+    _buckets: the number of trip times of at least EXACT_LIMIT in each
+              logarithmic bucket (see _bucket), for non-empty buckets only
+
+    === Representation Invariants ===
+    count == sum(_exact) + sum(_buckets.values())
+    """
+    count: int
+    total: int
+    minimum: int
+    maximum: int
+
+    def __init__(self) -> None:
+        """Initialize an accumulator with no trip times."""
+        self.count = 0
+        self.total = 0
+        self.minimum = -1
+        self.maximum = -1
+        self._exact = [0] * EXACT_LIMIT
+        self._buckets = {}
+
+    def add(self, trip_time: int, times: int = 1) -> None:
+        """Add <times> people whose trip took <trip_time> rounds.
+
+        Precondition: trip_time >= 0 and times >= 1
+        """
+        if self.count == 0 or trip_time < self.minimum:
+            self.minimum = trip_time
+        if trip_time > self.maximum:
+            self.maximum = trip_time
+        self.count += times
+        self.total += trip_time * times
+
+        if trip_time < EXACT_LIMIT:
+            self._exact[trip_time] += times
+        else:
+            bucket = _bucket(trip_time)
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + times
+
+    def merge(self, other: 'TripTimeAccumulator') -> None:
+        """Add all the trip times of <other> to this accumulator."""
+        if other.count == 0:
+            return
+        if self.count == 0 or other.minimum < self.minimum:
+            self.minimum = other.minimum
+        self.maximum = max(self.maximum, other.maximum)
+        self.count += other.count
+        self.total += other.total
+        for trip_time, times in enumerate(other._exact):
+            self._exact[trip_time] += times
+        for bucket, times in other._buckets.items():
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + times
+
+    def mean(self) -> int:
+        """Return the average trip time, rounded down, or -1 if there are no
+        trip times.
+        """
+        return int(self.total / self.count) if self.count != 0 else -1
+
+    def percentile(self, percent: float) -> int:
+        """Return the <percent>th percentile trip time (by the nearest-rank
+        method), or -1 if there are no trip times.
+
+        The result is exact for trip times below EXACT_LIMIT, and within about
+        1% above it.
+
+        Precondition: 0 < percent <= 100
+        """
+        if self.count == 0:
+            return -1
+        rank = max(1, math.ceil(percent / 100 * self.count))
+
+        seen = 0
+        for trip_time, times in enumerate(self._exact):
+            seen += times
+            if seen >= rank:
+                return trip_time
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(max(_bucket_value(bucket), self.minimum),
+                           self.maximum)
+        return self.maximum
+
+    def percentiles(self, percents: List[float]) -> Dict[float, int]:
+        """Return a dictionary mapping each of <percents> to its percentile
+        trip time (see percentile).
+        """
+        return {percent: self.percentile(percent) for percent in percents}
+
+
+class RoundMetricsWriter:
+    """A writer of one record per simulation round to a CSV or JSON Lines
+    file.
+
+    Each record has the round number ('round'), the number of people waiting
+    on each floor ('waiting', floor 1 first), the number of passengers on each
+    elevator ('elevator_load'), the total number of passengers ('in_transit')
+    and the number of people who reached their target floor that round
+    ('completed'). In a CSV file the per-floor and per-elevator lists are
+    spread over columns waiting_1, waiting_2, ... and elevator_load_1, ...
+
+    Records are buffered and written batch_size at a time, so recording a
+    round costs little more than building its record.
+
+    === Attributes ===
+    filename: the file the records are written to
+    batch_size: the number of records buffered before they are written
+
+    === Private Attributes ===
+    _num_floors: the number of floors in the simulation
+    _num_elevators: the number of elevators in the simulation
+    _file: the open output file, or None once closed
+    _csv: the CSV writer for _file, or None when writing JSON Lines
+    _buffer: the records not yet written, as CSV rows or JSON lines
+    """
+    filename: str
+    batch_size: int
+
+    def __init__(self, filename: str, num_floors: int, num_elevators: int,
+                 batch_size: int = 256) -> None:
+        """Initialize a writer of records for a simulation with <num_floors>
+        floors and <num_elevators> elevators to <filename>, replacing it.
+
+        The file is CSV if <filename> ends in '.csv', and JSON Lines
+        otherwise.
+
+        Precondition: batch_size >= 1
+        """
+        self.filename = filename
+        self.batch_size = batch_size
+        self._num_floors = num_floors
+        self._num_elevators = num_elevators
+        self._buffer = []
+        self._file: Optional[TextIO] = open(filename, 'w', newline='')
+        self._csv = None
+        if filename.endswith('.csv'):
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(
+                ['round'] +
+                [f'waiting_{floor}' for floor in range(1, num_floors + 1)] +
+                [f'elevator_load_{i}' for i in range(1, num_elevators + 1)] +
+                ['in_transit', 'completed'])
+
+    def record(self, round_num: int, waiting: List[int],
+               elevator_load: List[int], completed: int) -> None:
+        """Record the state at the end of round <round_num>.
+
+        <waiting> is the number of people waiting on each floor, floor 1 first,
+        <elevator_load> the number of passengers on each elevator, and
+        <completed> the number of people who reached their target floor this
+        round.
+        """
+        in_transit = sum(elevator_load)
+        if self._csv is not None:
+            self._buffer.append([round_num] + waiting + elevator_load +
+                                [in_transit, completed])
+        else:
+            self._buffer.append(json.dumps({
+                'round': round_num,
+                'waiting': waiting,
+                'elevator_load': elevator_load,
+                'in_transit': in_transit,
+                'completed': completed
+            }))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def record_idle(self, start: int, stop: int) -> None:
+        """Record rounds <start> to <stop> - 1, in which nobody was waiting
+        or riding an elevator.
+        """
+        for round_num in range(start, stop):
+            self.record(round_num, [0] * self._num_floors,
+                        [0] * self._num_elevators, 0)
+
+    def flush(self) -> None:
+        """Write the buffered records to the file."""
+        if not self._buffer:
+            return
+        if self._csv is not None:
+            self._csv.writerows(self._buffer)
+        else:
+            self._file.write('\n'.join(self._buffer) + '\n')
+        self._buffer = []
+
+    def close(self) -> None:
+        """Write the buffered records and close the file.
+
+        Closing a closed writer does nothing.
+        """
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+class StageTimer:
+    """Call counts and total running times of the stages of a simulation.
+
+    Stages are timed by replacing methods of the simulation with timed
+    versions (see instrument), so a simulation that is not timed runs its
+    methods unchanged and pays nothing.
+
+    === Attributes ===
+    calls: the number of times each stage ran
+    total_ns: the total time, in nanoseconds, spent in each stage
+    """
+    calls: Dict[str, int]
+    total_ns: Dict[str, int]
+
+    def __init__(self) -> None:
+        """Initialize a timer with no stages."""
+        self.calls = {}
+        self.total_ns = {}
+
+    def wrap(self, stage: str, function: Callable) -> Callable:
+        """Return a version of <function> that adds each of its calls to
+        <stage>.
+
+        Several functions can be added to the same stage.
+        """
+        self.calls.setdefault(stage, 0)
+        self.total_ns.setdefault(stage, 0)
+        clock = time.perf_counter_ns
+
+        @functools.wraps(function)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.total_ns[stage] += clock() - start
+                self.calls[stage] += 1
+        return timed
+
+    def instrument(self, obj: Any, stages: Dict[str, List[str]]) -> None:
+        """Time methods of <obj>: <stages> maps each stage name to the names of
+        the methods of <obj> that make it up.
+
+        The timed methods are set on <obj> itself, so other objects of its
+        class are not affected.
+        """
+        for stage, methods in stages.items():
+            for method in methods:
+                setattr(obj, method, self.wrap(stage, getattr(obj, method)))
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        """Return a dictionary mapping each stage to its 'calls' and
+        'total_ns'.
+        """
+        return {stage: {'calls': self.calls[stage],
+                        'total_ns': self.total_ns[stage]}
+                for stage in self.calls}
+
+
+def _bucket(trip_time: int) -> int:
+    """Return the logarithmic bucket of <trip_time>.
+
+    Precondition: trip_time >= EXACT_LIMIT
+    """
+    return int(math.log2(trip_time / EXACT_LIMIT) * BUCKETS_PER_DOUBLING)
+
+
+def _bucket_value(bucket: int) -> int:
+    """Return the trip time that represents the logarithmic bucket <bucket>:
+    the geometric middle of the times in it.
+    """
+    return round(EXACT_LIMIT * 2 ** ((bucket + 0.5) / BUCKETS_PER_DOUBLING))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['RoundMetricsWriter.__init__'],
+        'extra-imports': ['csv', 'functools', 'json', 'math', 'time'],
+        'disable': ['W0212']
+    })
@@ -0,0 +1,175 @@
+"""CSC148 Assignment 1 - Monte Carlo Runner
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module runs many independent replicas of one simulation configuration
+in parallel, and combines their statistics.
+
+A single short run with random arrivals (like sample_run in simulation.py)
+says little about how long people wait in general. run_replicas runs the same
+configuration many times, each replica in a worker process with its own seed,
+and summarize turns the per-replica statistics into means and confidence
+intervals. For example:
+
+    results = run_replicas(config, num_rounds=100, num_replicas=200)
+    print(format_summary(summarize(results)))
+"""
+import copy
+import math
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from algorithms import derive_seed
+from simulation import Simulation
+
+# The statistics that are -1 in a replica where nobody reached their target
+_TIME_STATS = ('max_time', 'min_time', 'avg_time', 'p50_time', 'p95_time',
+               'p99_time')
+
+
+def _run_replica(args: Tuple[type, Dict[str, Any], int, int]) \
+        -> Dict[str, int]:
+    """Run one replica and return its statistics.
+
+    <args> is (engine, config, num_rounds, seed): the simulation class to
+    use, its configuration, the number of rounds to run, and the replica's
+    master seed. The seed is used for config['seed'], and also seeds the
+    random module for algorithms that use it directly.
+    """
+    engine, config, num_rounds, seed = args
+    config = copy.deepcopy(config)
+    config['seed'] = seed
+    random.seed(seed)
+    return engine(config).run(num_rounds)
+
+
+def replica_seeds(seed: int, num_replicas: int) -> List[int]:
+    """Return the seeds of <num_replicas> replicas with master seed <seed>.
+
+    The same master seed always gives the same replica seeds.
+    """
+    return [derive_seed(seed, f'replica {i}') for i in range(num_replicas)]
+
+
+def run_replicas(config: Dict[str, Any], num_rounds: int, num_replicas: int,
+                 seed: int = 0, max_workers: Optional[int] = None,
+                 engine: type = Simulation) -> List[Dict[str, int]]:
+    """Run <num_replicas> independent replicas of the simulation with
+    configuration <config> for <num_rounds> rounds, and return the statistics
+    of each replica in order.
+
+    Replicas run in a pool of <max_workers> processes (one per core by
+    default), or in this process if <max_workers> is 1. <engine> is the
+    simulation class to run: Simulation, or VectorizedSimulation for large
+    configurations. Each replica starts from a fresh copy of <config> with
+    its own seed, so the arrival generator and moving algorithm must be
+    picklable, and the results depend only on <seed>, not on how replicas
+    are spread over workers.
+
+    Precondition: config['visualize'] is False, num_rounds >= 1 and
+    num_replicas >= 1.
+    """
+    tasks = [(engine, config, num_rounds, replica_seed)
+             for replica_seed in replica_seeds(seed, num_replicas)]
+    if max_workers == 1:
+        return [_run_replica(task) for task in tasks]
+
+    workers = max_workers or os.cpu_count() or 1
+    # a few replicas per message keeps the pool busy without leaving one
+    # worker with a large batch at the end
+    chunksize = max(1, num_replicas // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_replica, tasks, chunksize=chunksize))
+
+
+def summarize(results: List[Dict[str, int]], confidence: float = 0.95) \
+        -> Dict[str, Dict[str, float]]:
+    """Return a summary of each statistic over the replica results
+    <results>.
+
+    Each statistic is mapped to a dictionary with the number of replicas
+    used ('n'), the 'mean' and standard deviation ('stdev'), and the lower
+    and upper ends of a normal-approximation <confidence> confidence interval
+    for the mean ('ci_low' and 'ci_high'). Replicas where nobody reached their
+    target floor are left out of the time statistics, and statistics that
+    are not numbers (like stage timings) are left out of the summary.
+
+    Precondition: 0 < confidence < 1
+    """
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    summary = {}
+    for name in results[0] if results else []:
+        if not isinstance(results[0][name], (int, float)):
+            # e.g. stage timings
+            continue
+        values = [result[name] for result in results
+                  if name not in _TIME_STATS or result[name] != -1]
+        if not values:
+            continue
+        mean = statistics.fmean(values)
+        stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+        half_width = z * stdev / math.sqrt(len(values))
+        summary[name] = {
+            'n': len(values),
+            'mean': mean,
+            'stdev': stdev,
+            'ci_low': mean - half_width,
+            'ci_high': mean + half_width
+        }
+    return summary
+
+
+def format_summary(summary: Dict[str, Dict[str, float]]) -> str:
+    """Return <summary> (as returned by summarize) as a table."""
+    lines = [f"{'statistic':<18}{'n':>6}{'mean':>12}{'stdev':>12}"
+             f"{'ci low':>12}{'ci high':>12}"]
+    for name, row in summary.items():
+        lines.append(f"{name:<18}{row['n']:>6}{row['mean']:>12.2f}"
+                     f"{row['stdev']:>12.2f}{row['ci_low']:>12.2f}"
+                     f"{row['ci_high']:>12.2f}")
+    return '\n'.join(lines)
+
+
+def format_replicas(results: List[Dict[str, int]]) -> str:
+    """Return the statistics of each replica in <results> as a table, one
+    row per replica. Statistics that are not numbers (like stage timings)
+    are left out, as in summarize.
+    """
+    if not results:
+        return ''
+    names = [name for name in results[0]
+             if isinstance(results[0][name], (int, float))]
+    lines = [f"{'replica':>8}" + ''.join(f'{name:>18}' for name in names)]
+    for i, result in enumerate(results):
+        lines.append(f'{i:>8}' +
+                     ''.join(f'{result[name]:>18}' for name in names))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import algorithms
+    sample_config = {
+        'num_floors': 6,
+        'num_elevators': 6,
+        'elevator_capacity': 3,
+        'num_people_per_round': 2,
+        'arrival_generator': algorithms.RandomArrivals(6, 2),
+        'moving_algorithm': algorithms.RandomAlgorithm(),
+        'visualize': False
+    }
+    print(format_summary(summarize(run_replicas(sample_config, 15, 100))))
+
+    # import python_ta
+    """
+    python_ta.check_all(config={
+        'extra-imports': ['algorithms', 'concurrent.futures', 'copy', 'math',
+                          'os', 'random', 'simulation', 'statistics'],
+        'disable': ['R0201']
+    })
+    """
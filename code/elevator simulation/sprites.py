@@ -14,16 +14,30 @@ DO NOT CHANGE ANY CODE IN THIS FILE. You don't need to for this assignment,
 and in fact you aren't even submitting this file!
 
 The two classes whose documentation you are required to read are ElevatorSprite
-and PersonSprite, as you'll be implementing their subclasses.
+and PersonSprite. Each one draws a single Elevator or Person from entities.py;
+the Visualizer creates them and attaches them to the entities it shows, so
+headless simulations never build a sprite.
 You can completely ignore the other Sprite classes in this file.
+
+Sprites that move or change are DirtySprites: whoever changes one sets its
+dirty flag, and the Visualizer redraws only those parts of the screen.
 """
+from __future__ import annotations
 import random
-from typing import Any
+from typing import Any, List, Optional, TYPE_CHECKING
 import pygame
 
+if TYPE_CHECKING:
+    from entities import Elevator, Person
+
 
 # Images for people
 FIGURES = [f'people/person{i}.png' for i in range(1, 6)]
+# The FIGURES images, loaded and scaled once and shared by all person sprites
+_PERSON_IMAGES: List[pygame.Surface] = []
+# Random nudges that stop sprites from lining up exactly. They have their own
+# stream, so visualizing a simulation does not change its random results.
+jitter = random.Random()
 
 
 WHITE = (255, 255, 255)
@@ -49,38 +63,72 @@ PERSON_WIDTH = 32         # Person width
 
 # Fonts
 FONT_HEIGHT = 30
-pygame.init()
-COMIC_SANS = pygame.font.SysFont('Comic Sans MS', FONT_HEIGHT)
+_COMIC_SANS: Optional[pygame.font.Font] = None
+
+
+def comic_sans() -> pygame.font.Font:
+    """Return the font used for text sprites.
+
+    The font is only looked up the first time it is needed, so importing this
+    module does not initialize pygame or scan the system fonts.
+    """
+    global _COMIC_SANS
+    if _COMIC_SANS is None:
+        pygame.font.init()
+        _COMIC_SANS = pygame.font.SysFont('Comic Sans MS', FONT_HEIGHT)
+    return _COMIC_SANS
+
+
+def person_images() -> List[pygame.Surface]:
+    """Return the person images, one per anger level, scaled to the size of a
+    person sprite.
+
+    The images are loaded from disk the first time this is called, and the
+    same surfaces are returned (and shared by every PersonSprite) afterwards.
+    """
+    if not _PERSON_IMAGES:
+        for figure in FIGURES:
+            image = pygame.transform.scale(pygame.image.load(figure),
+                                           (PERSON_WIDTH, PERSON_HEIGHT))
+            if pygame.display.get_surface() is not None:
+                image = image.convert_alpha()
+            _PERSON_IMAGES.append(image)
+    return _PERSON_IMAGES
 
 
 ###############################################################################
 # Sprites
 ###############################################################################
-class ElevatorSprite(pygame.sprite.Sprite):
+class ElevatorSprite(pygame.sprite.DirtySprite):
     """Sprite representing an elevator.
 
     === Attributes ===
+    elevator: the elevator drawn by this sprite
     image: the Pygame surface on which to draw this sprite
     rect: the rectangle representing the dimensions of this sprite
     """
+    elevator: Elevator
     image: pygame.Surface
     rect: pygame.Rect
 
-    def __init__(self) -> None:
-        """Initialize a new ElevatorSprite."""
-        pygame.sprite.Sprite.__init__(self)
+    def __init__(self, elevator: Elevator) -> None:
+        """Initialize a new ElevatorSprite drawing the given elevator."""
+        pygame.sprite.DirtySprite.__init__(self)
+        self.elevator = elevator
         self.image = pygame.Surface([ELEVATOR_WIDTH, ELEVATOR_HEIGHT])
         self.image.fill(GREEN)
         self.image.set_colorkey(WHITE)
         self.rect = self.image.get_rect()
 
     def update(self) -> None:
-        """Update this elevator's image based on its fullness."""
+        """Update this elevator's image based on its fullness, and mark it to
+        be redrawn."""
         pygame.draw.rect(self.image, GREEN,
                          [0, 0, ELEVATOR_WIDTH, ELEVATOR_HEIGHT])
         pygame.draw.rect(self.image, DARK_GREEN,
                          [0, ELEVATOR_HEIGHT * (1 - self.fullness()),
                           ELEVATOR_WIDTH, ELEVATOR_HEIGHT])
+        self.dirty = 1
 
     def fullness(self) -> float:
         """Return the fraction that this elevator is filled.
@@ -88,13 +136,14 @@ class ElevatorSprite(pygame.sprite.Sprite):
         The value returned should be a float between 0.0 (completely empty) and
         1.0 (completely full).
         """
-        raise NotImplementedError
+        return self.elevator.fullness()
 
 
-class PersonSprite(pygame.sprite.Sprite):
+class PersonSprite(pygame.sprite.DirtySprite):
     """Sprite representing a person.
 
     === Attributes ===
+    person: the person drawn by this sprite
     height: the height of the person sprite
     width: the width of the person sprite
     image: the Pygame surface on which to draw this sprite
@@ -104,26 +153,30 @@ class PersonSprite(pygame.sprite.Sprite):
     height >= 0
     width >= 0
     """
+    person: Person
     height: int
     width: int
     image: pygame.Surface
     rect: pygame.Rect
 
-    def __init__(self) -> None:
-        """Initialize a new person sprite."""
+    def __init__(self, person: Person) -> None:
+        """Initialize a new sprite drawing the given person."""
         super().__init__()
+        self.person = person
         self.width, self.height = PERSON_WIDTH, PERSON_HEIGHT
         self.image = self.load_image()
         self.rect = self.image.get_rect()
         self.rect.bottom = 0
-        self.rect.centerx = random.randint(-2, 2)
+        self.rect.centerx = jitter.randint(-2, 2)
 
     def load_image(self) -> Any:
-        """Load the image for this sprite and redraws it
+        """Return the image for this sprite's current anger level.
         Lower indices are happier :)
+
+        The image is shared with every other person sprite (see
+        person_images), so calling this does no disk I/O or scaling.
         """
-        image = pygame.image.load(FIGURES[self.get_anger_level()])
-        return pygame.transform.scale(image, (self.width, self.height))
+        return person_images()[self.get_anger_level()]
 
     def get_anger_level(self) -> int:
         """Return the anger level of this sprite.
@@ -133,7 +186,7 @@ class PersonSprite(pygame.sprite.Sprite):
         Anger level must be an integer between 0 and 4, inclusive.
         (0 means not at all angry, 4 is very angry)
         """
-        raise NotImplementedError
+        return self.person.get_anger_level()
 
 
 class FloorSprite(pygame.sprite.Sprite):
@@ -154,19 +207,19 @@ class FloorNum(pygame.sprite.Sprite):
     """
     def __init__(self, floor_y: int, text: str) -> None:
         super().__init__()
-        self.floor_font = COMIC_SANS
+        self.floor_font = comic_sans()
         self.image = self.floor_font.render(text, True, BLACK)
         self.rect = self.image.get_rect()
         self.rect.bottom = floor_y
         self.rect.right = WIDTH - 20
 
 
-class StatLine(pygame.sprite.Sprite):
+class StatLine(pygame.sprite.DirtySprite):
     """Text Sprite for displaying some text.
     """
     def __init__(self, y: int, text: str):
         super().__init__()
-        self.floor_font = COMIC_SANS
+        self.floor_font = comic_sans()
         self.image = self.floor_font.render(text, True, BLACK)
         self.rect = self.image.get_rect()
         self.rect.top = y
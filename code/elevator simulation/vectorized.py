@@ -0,0 +1,615 @@
+"""CSC148 Assignment 1 - Vectorized Simulation
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains VectorizedSimulation, an alternative to the Simulation
+class in simulation.py for large, headless runs.
+
+Instead of one Python object per person and elevator, it keeps the people and
+elevators of the simulation in struct-of-arrays form (one NumPy array per
+attribute), and runs each stage of a round (arrivals, leaving, boarding and
+moving) as a handful of array operations. It accepts the same configuration
+and returns the same statistics as Simulation, and for the PushyPassenger and
+ShortSighted algorithms it produces exactly the same results.
+
+Every round costs a fixed number of array operations, however many people and
+elevators there are, so it pays off in large buildings with many elevators;
+in small ones Simulation is faster.
+"""
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import algorithms
+from entities import Person
+from metrics import RoundMetricsWriter, StageTimer, TripTimeAccumulator
+
+# Sentinel for "no target floor" when taking per-elevator minimums
+_NO_KEY = np.iinfo(np.int64).max
+# The number of people each floor's queue has room for at first; a queue
+# doubles in size when it runs out of room
+_INITIAL_QUEUE_CAPACITY = 16
+
+# The methods making up each stage of a round, for timing them
+_STAGE_METHODS = {
+    'generate_arrivals': ['_generate_arrivals'],
+    'handle_leaving': ['_handle_leaving'],
+    'handle_boarding': ['_handle_boarding'],
+    'move_elevators': ['_move_elevators']
+}
+
+
+class BulkRandomArrivals(algorithms.ArrivalGenerator):
+    """Generate a fixed number of random people each round, drawing the
+    arrivals of many rounds at once.
+
+    The people arriving each round have the same distribution as with
+    RandomArrivals: a start floor and a different target floor, uniformly at
+    random. Instead of sampling person by person, the arrivals of a block of
+    num_rounds rounds are drawn as two arrays in one go, and each call to
+    generate returns a slice of them. A new block is drawn when a round past
+    the current one is requested.
+
+    === Attributes ===
+    num_rounds: the number of rounds drawn at a time; usually the number of
+                rounds the simulation will run
+
+    === Private Attributes ===
+    _rng: the NumPy generator the blocks are drawn from, or None until the
+          first block is drawn or reseed is called
+    _block_start: the first round of the current block
+    _starts: the start floors of the people arriving in each round of the
+             current block, one row per round, in generation order
+    _targets: the target floors of the same people
+
+    === Representation Invariants ===
+    num_rounds >= 1
+    _starts and _targets have shape (num_rounds, num_people), or are None
+    before the first block is drawn.
+    """
+    num_rounds: int
+
+    def __init__(self, max_floor: int, num_people: Optional[int],
+                 num_rounds: int) -> None:
+        """Initialize a new BulkRandomArrivals.
+
+        Preconditions:
+            max_floor >= 2
+            num_people is None or num_people >= 0
+            num_rounds >= 1
+        """
+        algorithms.ArrivalGenerator.__init__(self, max_floor, num_people)
+        self.num_rounds = num_rounds
+        self._block_start = 0
+        self._starts = None
+        self._targets = None
+
+    def reseed(self, seed: int) -> None:
+        """Give this generator its own random stream, seeded with <seed>,
+        and forget any arrivals already drawn.
+        """
+        self._rng = np.random.default_rng(seed)
+        self._block_start = 0
+        self._starts = None
+        self._targets = None
+
+    def _draw_block(self, block_start: int) -> None:
+        """Draw the arrivals of the block of rounds starting at
+        <block_start>.
+        """
+        if self._rng is None:
+            self._rng = np.random.default_rng(random.getrandbits(64))
+        shape = (self.num_rounds, self.num_people or 0)
+        self._starts = self._rng.integers(1, self.max_floor + 1, shape)
+        # a target among the other max_floor - 1 floors: draw from
+        # 1..max_floor - 1 and skip over the start floor
+        self._targets = self._rng.integers(1, self.max_floor, shape)
+        self._targets += self._targets >= self._starts
+        self._block_start = block_start
+
+    def generate_arrays(self, round_num: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the start and target floors of the people arriving at
+        round <round_num>, in generation order.
+
+        Precondition: round_num is not less than in any previous call.
+        """
+        if (self._starts is None or
+                round_num >= self._block_start + self.num_rounds):
+            block = round_num - round_num % self.num_rounds
+            self._draw_block(block)
+        row = round_num - self._block_start
+        return self._starts[row], self._targets[row]
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Return the new arrivals for the simulation at the given round.
+
+        Only floors where people arrived are included.
+
+        Precondition: round_num is not less than in any previous call.
+        """
+        starts, targets = self.generate_arrays(round_num)
+        arrivals = {}
+        for start, target in zip(starts.tolist(), targets.tolist()):
+            arrivals.setdefault(start, []).append(Person(start, target))
+        return arrivals
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round, from <round_num> on, in which someone may
+        arrive, or None if nobody will ever arrive again.
+        """
+        return round_num if self.num_people else None
+
+
+class VectorizedSimulation:
+    """A simulation whose people and elevators are stored in NumPy arrays.
+
+    Only the built-in moving algorithms (RandomAlgorithm, PushyPassenger and
+    ShortSighted) are supported, each through an array implementation of the
+    same rules. Any arrival generator can be used: arrivals are converted to
+    arrays as they are generated, unless the generator can produce arrays
+    itself.
+
+    Waiting people are kept in one ring buffer per floor, in arrival order,
+    so arrivals are written at the tail of their floor's queue and boarding
+    takes people from its head, without moving anyone else. The ring buffers
+    are regions of one flat buffer, each with its own capacity: a floor
+    whose queue outgrows its region moves to a region twice the size at the
+    end of the buffer, leaving the other floors where they are. Passengers are
+    kept in a (number of elevators) by (elevator capacity) table of seats, so
+    leaving and the moving algorithms never look at waiting people.
+
+    === Attributes ===
+    arrival_generator: the algorithm used to generate new arrivals.
+    moving_algorithm: the algorithm used to decide how to move elevators
+    num_floors: the number of floors
+    num_elevators: the number of elevators
+    elevator_capacity: the maximum number of people on each elevator
+    num_iterations: the number of simulation rounds that took place
+    total_people: the number of people that arrived at some point during the
+                  simulation
+    people_completed: the number of people who reached their target floor
+    max_time: the maximum time someone spent before reaching their target
+              floor, or -1 if nobody has
+    trip_times: a summary of the time each person who reached their target
+                floor spent doing so
+
+    === Private Attributes ===
+    _wait_target: the flat buffer holding every floor's ring buffer of
+                  waiting people's target floors
+    _wait_arrival: the rounds waiting people arrived in, laid out like
+                   _wait_target
+    _wait_start: where each floor's region of the buffer starts
+    _wait_capacity: the length of each floor's region of the buffer
+    _wait_head: the offset in its region of the first person waiting on each
+                floor, modulo the region's length
+    _wait_count: the number of people waiting on each floor (index 0 unused)
+    _wait_end: where the last region of the buffer ends
+    _seat_target: the target floor of the passenger in each seat of each
+                  elevator, or 0 for an empty seat
+    _seat_arrival: the round the passenger in each seat arrived in
+    _seat_order: increasing numbers recording the order passengers boarded
+                 in, or _NO_KEY for an empty seat
+    _next_order: the next unused boarding number
+    _floor: the floor each elevator is on
+    _load: the number of passengers on each elevator
+    _rng: the random number generator used by RandomAlgorithm, or None for
+          the other algorithms
+    _round_metrics: the file each run records per-round metrics to, or None
+                    if it records none
+    _stage_timer: the timer of the stages of each round, or None if they are
+                  not timed
+    _profiler: the profiler enabled while the simulation runs, or None
+
+    === Representation Invariants ===
+    _wait_target and _wait_arrival have the same length, at least _wait_end,
+    and the people waiting on floor f, in arrival order, are at positions
+    _wait_start[f] + (_wait_head[f] + k) % _wait_capacity[f] of them, for
+    0 <= k < _wait_count[f].
+    _wait_count[f] <= _wait_capacity[f], and the regions of the floors do
+    not overlap.
+    The _seat arrays all have shape (num_elevators, elevator_capacity).
+    """
+    arrival_generator: algorithms.ArrivalGenerator
+    moving_algorithm: algorithms.MovingAlgorithm
+    num_floors: int
+    num_elevators: int
+    elevator_capacity: int
+    num_iterations: int
+    total_people: int
+    people_completed: int
+    max_time: int
+    trip_times: TripTimeAccumulator
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        """Initialize a new simulation using the given configuration.
+
+        The configuration has the same keys as for Simulation. Raise
+        ValueError if config['visualize'] is True, or if there is no array
+        implementation of config['moving_algorithm'].
+        """
+        if config['visualize']:
+            raise ValueError('VectorizedSimulation cannot be visualized')
+        self.moving_algorithm = config['moving_algorithm']
+        if not isinstance(self.moving_algorithm,
+                          (algorithms.RandomAlgorithm,
+                           algorithms.PushyPassenger,
+                           algorithms.ShortSighted)):
+            raise ValueError(f'no vectorized implementation of '
+                             f'{type(self.moving_algorithm).__name__}')
+
+        algorithms.seed_streams(config)
+        self._round_metrics = config.get('round_metrics')
+        self.arrival_generator = config['arrival_generator']
+        self.num_floors = config['num_floors']
+        self.num_elevators = config['num_elevators']
+        self.elevator_capacity = config['elevator_capacity']
+        self.num_iterations = 0
+        self.total_people = 0
+        self.people_completed = 0
+        self.max_time = -1
+
+        self._wait_capacity = np.full(self.num_floors + 1,
+                                      _INITIAL_QUEUE_CAPACITY, dtype=np.int64)
+        self._wait_start = np.cumsum(self._wait_capacity) - \
+            self._wait_capacity
+        self._wait_end = int(self._wait_capacity.sum())
+        self._wait_target = np.zeros(self._wait_end, dtype=np.int64)
+        self._wait_arrival = np.zeros(self._wait_end, dtype=np.int64)
+        self._wait_head = np.zeros(self.num_floors + 1, dtype=np.int64)
+        self._wait_count = np.zeros(self.num_floors + 1, dtype=np.int64)
+
+        seats = (self.num_elevators, self.elevator_capacity)
+        self._seat_target = np.zeros(seats, dtype=np.int64)
+        self._seat_arrival = np.zeros(seats, dtype=np.int64)
+        self._seat_order = np.full(seats, _NO_KEY, dtype=np.int64)
+        self._next_order = 0
+        self._floor = np.ones(self.num_elevators, dtype=np.int64)
+        self._load = np.zeros(self.num_elevators, dtype=np.int64)
+
+        self.trip_times = TripTimeAccumulator()
+        self._rng = None
+        if isinstance(self.moving_algorithm, algorithms.RandomAlgorithm):
+            if config.get('seed') is None:
+                seed = random.getrandbits(64)
+            else:
+                seed = algorithms.derive_seed(config['seed'], 'moving')
+            self._rng = np.random.default_rng(seed)
+
+        self._stage_timer = None
+        if config.get('stage_timings'):
+            self._stage_timer = StageTimer()
+            self._stage_timer.instrument(self, _STAGE_METHODS)
+        self._profiler = config.get('profiler')
+
+    def run(self, num_rounds: int) -> Dict[str, Any]:
+        """Run the simulation for the given number of rounds.
+
+        Return the same statistics as Simulation.run, including the stage
+        timings if they were asked for.
+
+        Precondition: num_rounds >= 1.
+        """
+        self.num_iterations = num_rounds
+
+        writer = None
+        if self._round_metrics is not None:
+            writer = RoundMetricsWriter(self._round_metrics, self.num_floors,
+                                        self.num_elevators)
+        if self._profiler is not None:
+            self._profiler.enable()
+        try:
+            i = self._next_active_round(0, num_rounds, writer)
+            while i < num_rounds:
+                completed_before = self.people_completed
+                self._generate_arrivals(i)
+                self._handle_leaving(i)
+                self._handle_boarding()
+                self._move_elevators()
+                if writer is not None:
+                    writer.record(i, self._wait_count[1:].tolist(),
+                                  self._load.tolist(),
+                                  self.people_completed - completed_before)
+                i = self._next_active_round(i + 1, num_rounds, writer)
+        finally:
+            if self._profiler is not None:
+                self._profiler.disable()
+            if writer is not None:
+                writer.close()
+
+        stats = self._calculate_stats()
+        if self._stage_timer is not None:
+            stats['stage_timings'] = self._stage_timer.report()
+        return stats
+
+    ############################################################################
+    # Stages of a round
+    ############################################################################
+
+    def _next_active_round(self, round_num: int, num_rounds: int,
+                           writer: Optional[RoundMetricsWriter]) -> int:
+        """Return the first round, from <round_num> on, that has to be run,
+        or <num_rounds> if there is none before it.
+
+        Idle rounds are skipped exactly as in Simulation._next_active_round.
+        """
+        if (not self.moving_algorithm.stays_when_idle or
+                self.total_people != self.people_completed):
+            return round_num
+
+        next_round = self.arrival_generator.next_arrival_round(round_num)
+        if next_round is None or next_round > num_rounds:
+            next_round = num_rounds
+        if writer is not None:
+            writer.record_idle(round_num, next_round)
+        return next_round
+
+    def _arrival_arrays(self, round_num: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the start and target floors of the arrivals at round
+        <round_num>.
+
+        People arriving on the same floor are in the order they were
+        generated. Generators with a generate_arrays method (like
+        BulkRandomArrivals) give the arrays directly, without creating Person
+        objects.
+        """
+        if hasattr(self.arrival_generator, 'generate_arrays'):
+            return self.arrival_generator.generate_arrays(round_num)
+        new_arrivals = self.arrival_generator.generate(round_num)
+        starts = [person.start for people in new_arrivals.values()
+                  for person in people]
+        targets = [person.target for people in new_arrivals.values()
+                   for person in people]
+        return (np.array(starts, dtype=np.int64),
+                np.array(targets, dtype=np.int64))
+
+    def _generate_arrivals(self, round_num: int) -> None:
+        """Add the arrivals at round <round_num> to the end of the queues on
+        their floors.
+        """
+        starts, targets = self._arrival_arrays(round_num)
+        if len(starts) == 0:
+            return
+        self.total_people += len(starts)
+
+        by_floor = np.argsort(starts, kind='stable')
+        starts, targets = starts[by_floor], targets[by_floor]
+        new_count = np.bincount(starts, minlength=self.num_floors + 1)
+        self._reserve(self._wait_count + new_count)
+
+        _, rank = _segments(new_count)
+        positions = self._wait_start[starts] + (
+            self._wait_head[starts] + self._wait_count[starts] + rank) % \
+            self._wait_capacity[starts]
+        self._wait_target[positions] = targets
+        self._wait_arrival[positions] = round_num
+        self._wait_count += new_count
+
+    def _reserve(self, sizes: np.ndarray) -> None:
+        """Make each floor f's queue room for at least sizes[f] people.
+
+        A queue that is too short moves to a new region at the end of the
+        buffer, doubling its capacity until it is long enough, with the
+        people waiting in it in the same order. The buffer itself doubles in
+        length when it has no room for the new regions.
+        """
+        growing = np.flatnonzero(sizes > self._wait_capacity)
+        if len(growing) == 0:
+            return
+        capacity = self._wait_capacity[growing]
+        while (capacity < sizes[growing]).any():
+            capacity = np.where(capacity < sizes[growing], 2 * capacity,
+                                capacity)
+        start = self._wait_end + np.cumsum(capacity) - capacity
+        self._wait_end += int(capacity.sum())
+
+        if self._wait_end > len(self._wait_target):
+            length = max(2 * len(self._wait_target), self._wait_end)
+            for name in ['_wait_target', '_wait_arrival']:
+                old = getattr(self, name)
+                new = np.zeros(length, dtype=np.int64)
+                new[:len(old)] = old
+                setattr(self, name, new)
+
+        groups, rank = _segments(self._wait_count[growing])
+        floors = growing[groups]
+        old_positions = self._wait_start[floors] + (
+            self._wait_head[floors] + rank) % self._wait_capacity[floors]
+        new_positions = start[groups] + rank
+        for buffer in [self._wait_target, self._wait_arrival]:
+            buffer[new_positions] = buffer[old_positions]
+        self._wait_start[growing] = start
+        self._wait_capacity[growing] = capacity
+        self._wait_head[growing] = 0
+
+    def _handle_leaving(self, round_num: int) -> None:
+        """Empty the seats of passengers who are on their target floor,
+        recording their trip times.
+        """
+        leaving = self._seat_target == self._floor[:, np.newaxis]
+        num_leaving = int(np.count_nonzero(leaving))
+        if num_leaving == 0:
+            return
+
+        trip_times = (round_num - self._seat_arrival[leaving]).tolist()
+        for trip_time in trip_times:
+            self.trip_times.add(trip_time)
+        self.people_completed += num_leaving
+        self.max_time = max(self.max_time, max(trip_times))
+
+        self._seat_target[leaving] = 0
+        self._seat_order[leaving] = _NO_KEY
+        self._load -= np.count_nonzero(leaving, axis=1)
+
+    def _handle_boarding(self) -> None:
+        """Board waiting people onto the elevators on their floor.
+
+        As in Simulation, elevators take turns in order, and each one takes
+        the longest-waiting people on its floor up to its free capacity.
+        """
+        free = self.elevator_capacity - self._load
+        free_on_floor = np.bincount(self._floor, weights=free,
+                                    minlength=self.num_floors + 1)
+        num_boarding = np.minimum(self._wait_count,
+                                  free_on_floor.astype(np.int64))
+        total = int(num_boarding.sum())
+        if total == 0:
+            return
+
+        # The people boarding: the first num_boarding people in each floor's
+        # queue.
+        floors, rank = _segments(num_boarding)
+        boarding = self._wait_start[floors] + (
+            self._wait_head[floors] + rank) % self._wait_capacity[floors]
+
+        # Give each boarder a seat: the elevators on a floor, in index order,
+        # take consecutive ranks up to their free capacity.
+        by_floor = np.lexsort((np.arange(self.num_elevators), self._floor))
+        sorted_free = free[by_floor]
+        free_total = np.cumsum(sorted_free)
+        first = np.searchsorted(self._floor[by_floor], floors, 'left')
+        position = free_total[first] - sorted_free[first] + rank
+        index = np.searchsorted(free_total, position, 'right')
+        elevators = by_floor[index]
+        seat_rank = position - (free_total[index] - sorted_free[index])
+
+        elevator_seats, seats = np.nonzero(self._seat_target == 0)
+        first_free_seat = np.cumsum(free) - free
+        seats = seats[first_free_seat[elevators] + seat_rank]
+
+        self._seat_target[elevators, seats] = self._wait_target[boarding]
+        self._seat_arrival[elevators, seats] = self._wait_arrival[boarding]
+        # earlier ranks on an elevator get lower (and later rounds higher)
+        # boarding numbers
+        self._seat_order[elevators, seats] = self._next_order + seat_rank
+        self._next_order += self.elevator_capacity
+        self._load += np.bincount(elevators, minlength=self.num_elevators)
+
+        self._wait_head += num_boarding
+        self._wait_count -= num_boarding
+
+    def _move_elevators(self) -> None:
+        """Move the elevators with the array version of the moving
+        algorithm.
+        """
+        if isinstance(self.moving_algorithm, algorithms.PushyPassenger):
+            self._floor += self._pushy_directions()
+        elif isinstance(self.moving_algorithm, algorithms.ShortSighted):
+            self._floor += self._short_sighted_directions()
+        else:
+            self._floor += self._random_directions()
+
+    ############################################################################
+    # Moving algorithms
+    ############################################################################
+
+    def _random_directions(self) -> np.ndarray:
+        """Return a uniformly random valid direction for each elevator, as in
+        RandomAlgorithm.
+        """
+        at_top = self._floor == self.num_floors
+        at_bottom = self._floor == 1
+        num_choices = np.where(at_top | at_bottom, 2, 3)
+        choice = self._rng.integers(0, num_choices)
+        # choice 0, 1, 2 is UP, STAY, DOWN in the middle of the building,
+        # DOWN, STAY at the top and UP, STAY at the bottom
+        directions = 1 - choice
+        directions[at_top] = choice[at_top] - 1
+        directions[at_bottom] = 1 - choice[at_bottom]
+        return directions
+
+    def _pushy_directions(self) -> np.ndarray:
+        """Return the direction of each elevator under PushyPassenger."""
+        directions = np.zeros(self.num_elevators, dtype=np.int64)
+
+        waiting_floors = np.flatnonzero(self._wait_count)
+        empty = self._load == 0
+        if len(waiting_floors) > 0:
+            directions[empty] = np.sign(waiting_floors[0] -
+                                        self._floor[empty])
+
+        loaded = ~empty
+        if loaded.any():
+            # the first passenger of each elevator boarded before the others
+            first = np.argmin(self._seat_order[loaded], axis=1)
+            targets = self._seat_target[loaded][np.arange(len(first)), first]
+            directions[loaded] = np.sign(targets - self._floor[loaded])
+        return directions
+
+    def _short_sighted_directions(self) -> np.ndarray:
+        """Return the direction of each elevator under ShortSighted."""
+        directions = np.zeros(self.num_elevators, dtype=np.int64)
+
+        waiting_floors = np.flatnonzero(self._wait_count)
+        empty = np.flatnonzero(self._load == 0)
+        if len(waiting_floors) > 0 and len(empty) > 0:
+            here = self._floor[empty]
+            # the closest waiting floors below and above each empty elevator,
+            # ignoring its own floor
+            below_index = np.searchsorted(waiting_floors, here, 'left') - 1
+            above_index = np.searchsorted(waiting_floors, here, 'right')
+            has_below = below_index >= 0
+            has_above = above_index < len(waiting_floors)
+            below = waiting_floors[np.maximum(below_index, 0)]
+            above = waiting_floors[np.minimum(above_index,
+                                              len(waiting_floors) - 1)]
+            go_down = has_below & (~has_above | (here - below <= above - here))
+            go_up = has_above & ~go_down
+            directions[empty[go_down]] = -1
+            directions[empty[go_up]] = 1
+
+        loaded = self._load > 0
+        if loaded.any():
+            # rank each passenger's target by distance, then prefer lower
+            offset = self._seat_target - self._floor[:, np.newaxis]
+            key = np.where(self._seat_target > 0,
+                           2 * np.abs(offset) + (offset > 0), _NO_KEY)
+            closest = key.min(axis=1)
+            directions[loaded] = np.where(closest[loaded] % 2 == 1, 1, -1)
+        return directions
+
+    ############################################################################
+    # Statistics calculations
+    ############################################################################
+
+    def _calculate_stats(self) -> Dict[str, int]:
+        """Report the statistics for the current run of this simulation, with
+        the same keys and values as Simulation._calculate_stats.
+        """
+        return {
+            'num_iterations': self.num_iterations,
+            'total_people': self.total_people,
+            'people_completed': self.people_completed,
+            'max_time': self.max_time,
+            'min_time': self.trip_times.minimum,
+            'avg_time': self.trip_times.mean(),
+            'p50_time': self.trip_times.percentile(50),
+            'p95_time': self.trip_times.percentile(95),
+            'p99_time': self.trip_times.percentile(99)
+        }
+
+
+def _segments(counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the group and the rank within its group of each of
+    sum(counts) items, where group i has counts[i] items, in group order.
+
+    >>> groups, ranks = _segments(np.array([2, 0, 3]))
+    >>> groups.tolist(), ranks.tolist()
+    ([0, 0, 2, 2, 2], [0, 1, 0, 1, 2])
+    """
+    groups = np.arange(len(counts)).repeat(counts)
+    ranks = np.arange(len(groups)) - (counts.cumsum() - counts).repeat(counts)
+    return groups, ranks
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['algorithms', 'entities', 'metrics', 'numpy',
+                          'random'],
+        'max-attributes': 25,
+        'disable': ['R0201']
+    })
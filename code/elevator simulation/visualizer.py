@@ -14,12 +14,12 @@ DO NOT CHANGE ANY CODE IN THIS FILE. You don't need to for this assignment,
 and in fact you aren't even submitting this file!
 """
 from __future__ import annotations
-import random
 import time
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 import pygame
 from algorithms import Direction
+from entities import Elevator, Person
 import sprites
 
 
@@ -34,6 +34,8 @@ FLOOR_BORDER_HEIGHT = 10  # The height of the border
 
 # FPS based on config speed
 FPS = 60
+# The number of frames each round's animations take
+ANIMATION_FRAMES = 20
 
 
 class Visualizer:
@@ -43,14 +45,24 @@ class Visualizer:
     understanding them, and they are left undocumented.
     """
     def __init__(self,
-                 elevators: List[sprites.ElevatorSprite],
+                 elevators: List[Elevator],
                  num_floors: int,
-                 visualize: bool) -> None:
+                 visualize: bool,
+                 speed: float = 1) -> None:
         """Initialize this visualization.
 
-        If visualize is False, this instance does nothing.
+        If visualize is False, this instance does nothing, and in particular
+        never attaches sprites to the simulation's people and elevators.
+
+        <speed> is how fast the simulation plays back: at 1, frames are shown
+        at FPS and wait pauses for the time it is given; at 2, twice as fast.
+        At 0 there are no delays at all, and frames are shown as fast as they
+        can be drawn.
+
+        Precondition: speed >= 0
         """
         self._visualize = visualize
+        self._speed = speed
         if not self._visualize:
             return
 
@@ -63,13 +75,26 @@ class Visualizer:
 
         self._screen = pygame.display.set_mode(
             (WIDTH, self._total_height()), pygame.HWSURFACE | pygame.DOUBLEBUF)
-        self._screen.fill(WHITE)
 
-        # Contains all sprites in the simulation
-        self._sprite_group = pygame.sprite.Group()
-        self._stats_group = pygame.sprite.Group()
+        # The floors never change, so they are drawn once onto the
+        # background. Each frame only redraws the sprites that moved or
+        # changed (and whatever they uncovered), and only updates those
+        # parts of the display.
+        self._background = pygame.Surface(self._screen.get_size()).convert()
+        self._background.fill(WHITE)
+        self._sprite_group = pygame.sprite.LayeredDirty()
+        self._stat_line = None
+
+        # The animations of the current round, played together by the next
+        # render: (person sprite, from x, to x) for people walking, and
+        # (elevator, pixels per frame) for elevators moving
+        self._walks: List[Tuple[sprites.PersonSprite, int, int]] = []
+        self._moves: List[Tuple[Elevator, int]] = []
 
         self._setup_sprites(elevators)
+        self._sprite_group.clear(self._screen, self._background)
+        self._screen.blit(self._background, (0, 0))
+        pygame.display.flip()
         # Initial render.
         self.render()
 
@@ -77,11 +102,18 @@ class Visualizer:
         """Render text displaying the round number for this simulation."""
         if not self._visualize:
             return
-        self._stats_group.remove(list(self._stats_group))
-        self._stats_group.add(sprites.StatLine(0, f'Round {round_num}'))
+        if self._stat_line is not None:
+            self._sprite_group.remove(self._stat_line)
+        self._stat_line = sprites.StatLine(0, f'Round {round_num}')
+        self._sprite_group.add(self._stat_line, layer=1)
+        # Re-skin people for their new anger levels (a shared image swap);
+        # only the people whose level changed need redrawing.
         for sprite in self._sprite_group:
             if isinstance(sprite, sprites.PersonSprite):
-                sprite.image = sprite.load_image()
+                image = sprite.load_image()
+                if image is not sprite.image:
+                    sprite.image = image
+                    sprite.dirty = 1
         self.render()
 
     def _total_height(self) -> int:
@@ -99,22 +131,47 @@ class Visualizer:
 
     def render(self) -> None:
         """Draw the current state of the simulation to the screen.
+
+        The animations queued since the last render are played first, all at
+        once. Only the sprites marked dirty since the last frame are redrawn.
         """
         if not self._visualize:
             return
 
+        if self._walks or self._moves:
+            self._play_animations()
+        self._draw_frame()
+
+    def _play_animations(self) -> None:
+        """Play all the queued animations together, in one shared set of
+        ANIMATION_FRAMES frames, and empty the queue.
+        """
+        for frame in range(1, ANIMATION_FRAMES + 1):
+            for sprite, from_x, target_x in self._walks:
+                sprite.rect.centerx = \
+                    from_x + (target_x - from_x) * frame // ANIMATION_FRAMES
+                sprite.dirty = 1
+            for elevator, step in self._moves:
+                elevator.sprite.rect.bottom += step
+                elevator.sprite.dirty = 1
+                for passenger in elevator.passengers:
+                    passenger.sprite.rect.bottom += step
+                    passenger.sprite.dirty = 1
+            self._draw_frame()
+        self._walks = []
+        self._moves = []
+
+    def _draw_frame(self) -> None:
+        """Draw one frame: the sprites marked dirty since the last one."""
         # Need this on OSX due to pygame bug
         pygame.event.peek(0)
 
-        self._screen.fill(WHITE)
-        self._sprite_group.draw(self._screen)
-        self._stats_group.draw(self._screen)
-        self._clock.tick(FPS)
-        pygame.display.flip()
+        changed = self._sprite_group.draw(self._screen)
+        self._clock.tick(FPS * self._speed)
+        pygame.display.update(changed)
 
-    def show_arrivals(self,
-                      arrivals: Dict[int, List[sprites.PersonSprite]]) -> None:
-        """Show new arrivals."""
+    def show_arrivals(self, arrivals: Dict[int, List[Person]]) -> None:
+        """Show new arrivals, attaching a sprite to each new person."""
         if not self._visualize:
             return
 
@@ -122,79 +179,77 @@ class Visualizer:
         for floor, people in arrivals.items():
             y = self.get_y_of_floor(floor)
             for person in people:
-                person.rect.bottom = y
-                person.rect.centerx = x + random.randint(-3, 3)
-                self._sprite_group.add(person)
+                person.sprite = sprites.PersonSprite(person)
+                person.sprite.rect.bottom = y
+                person.sprite.rect.centerx = x + sprites.jitter.randint(-3, 3)
+                self._sprite_group.add(person.sprite)
         self.render()
 
-    def show_boarding(self, person: sprites.PersonSprite,
-                      elevator: sprites.ElevatorSprite) -> None:
+    def show_boarding(self, person: Person, elevator: Elevator) -> None:
         """Show boarding of the given person onto the given elevator.
 
+        The person walking to the elevator is queued, and played with the
+        rest of the round's animations by the next render.
+
         Precondition: the given person is on the same floor as the elevator.
         """
         if not self._visualize:
             return
 
         from_x = 10
-        target_x = elevator.rect.centerx + random.randint(-3, 3)
+        target_x = elevator.sprite.rect.centerx + sprites.jitter.randint(-3, 3)
+        person.sprite.rect.centerx = from_x
+        person.sprite.dirty = 1
+        self._walks.append((person.sprite, from_x, target_x))
+        elevator.sprite.update()
 
-        for frame in range(21):  # Move in 20 seconds
-            person.rect.centerx = from_x + (target_x - from_x) * frame // 20
-            self.render()
+    def show_disembarking(self, person: Person, elevator: Elevator) -> None:
+        """Show disembarking of the given person from the given elevator.
 
-        elevator.update()
-        self.render()
-
-    def show_disembarking(self, person: sprites.PersonSprite,
-                          elevator: sprites.ElevatorSprite) -> None:
-        """Show disembarking of the given person from the given elevator."""
+        The person walking away is queued, and played with the rest of the
+        round's animations by the next render.
+        """
         if not self._visualize:
             return
 
-        from_x = person.rect.centerx
-        target_x = WIDTH - 10
-
-        elevator.update()
-
-        for frame in range(21):  # Move in 20 seconds
-            x = from_x + (target_x - from_x) * frame // 20
-            person.rect.centerx = x
-            self.render()
+        self._walks.append((person.sprite, person.sprite.rect.centerx,
+                            WIDTH - 10))
+        elevator.sprite.update()
 
     def show_elevator_moves(self,
                             elevators: List[Elevator],
                             directions: List[Direction]) -> None:
-        """Show elevator moves. Note that all the elevators move at once."""
+        """Show elevator moves. Note that all the elevators move at once.
+
+        The moves are queued, and played with the rest of the round's
+        animations by the next render.
+        """
         if not self._visualize:
             return
 
-        for _ in range(20):  # Move in 20 seconds
-            for elevator, direction in zip(elevators, directions):
-                if direction == Direction.UP:
-                    step = - FLOOR_HEIGHT / 20
-                elif direction == Direction.DOWN:
-                    step = FLOOR_HEIGHT / 20
-                else:
-                    step = 0
-                elevator.rect.bottom += step
-                for passenger in elevator.passengers:
-                    passenger.rect.bottom += step
-
-            self.render()
+        for elevator, direction in zip(elevators, directions):
+            if direction != Direction.STAY:
+                # the screen's y-axis points down
+                self._moves.append(
+                    (elevator,
+                     -direction.value * FLOOR_HEIGHT // ANIMATION_FRAMES))
 
     def wait(self, wait_time: int) -> None:
-        """Wait for the specified amount of time, in seconds.
+        """Wait for the specified amount of time, in seconds, at this
+        visualization's playback speed.
 
-        Only occurs if self.visualize is true, otherwise there's no need to
-        wait.
+        Only occurs if self.visualize is true and the speed is not 0,
+        otherwise there's no need to wait.
         """
-        if self._visualize:
-            time.sleep(wait_time)
+        if self._visualize and self._speed > 0:
+            time.sleep(wait_time / self._speed)
 
-    def _setup_sprites(self, elevators: List[sprites.ElevatorSprite]) -> None:
+    def _setup_sprites(self, elevators: List[Elevator]) -> None:
         """Set up the initial sprites for this visualization.
 
+        Draw the floors onto the background, and attach a new ElevatorSprite
+        to each of the given elevators.
+
         Position them on the screen and spaces them based on:
             Size of the screen
             Number of each item
@@ -203,21 +258,24 @@ class Visualizer:
             y = self.get_y_of_floor(i)
             floor = sprites.FloorSprite(WIDTH, FLOOR_HEIGHT, y)
             floor_num = sprites.FloorNum(y - 20, str(i))
-            self._sprite_group.add(floor_num)
-            self._sprite_group.add(floor)
+            self._background.blit(floor_num.image, floor_num.rect)
+            self._background.blit(floor.image, floor.rect)
 
         for i, elevator in enumerate(elevators):
-            elevator.rect.centerx =\
+            elevator.sprite = sprites.ElevatorSprite(elevator)
+            elevator.sprite.rect.centerx =\
                 (i + 1) * WIDTH // (self._num_elevators + 1)
-            elevator.rect.bottom = self._total_height() - FLOOR_BORDER_HEIGHT
+            elevator.sprite.rect.bottom = \
+                self._total_height() - FLOOR_BORDER_HEIGHT
 
-            self._sprite_group.add(elevator)
+            self._sprite_group.add(elevator.sprite)
 
 
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['random', 'pygame', 'time', 'algorithms'],
+        'extra-imports': ['pygame', 'time', 'algorithms',
+                          'entities'],
         'generated-members': 'pygame.*',
         'max-attributes': 12,
         'disable': ['R0201']